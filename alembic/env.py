@@ -1,30 +1,21 @@
 import os
 import sys
+from logging.config import fileConfig
+from pathlib import Path
 
-# CRÍTICO: Limpiar variables de entorno problemáticas ANTES de cualquier import
-# Estas variables pueden tener encoding incorrecto en Windows
-vars_to_clear = [
-    'PGCLIENTENCODING', 'PGSSLMODE', 'PGSSLCERT', 'PGSSLKEY',
-    'PGSSLROOTCERT', 'PGPASSFILE', 'PGSERVICEFILE', 'PGOPTIONS',
-    'PGAPPNAME', 'CURL_CA_BUNDLE', 'SSL_CERT_FILE'
-]
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-for var in vars_to_clear:
-    os.environ.pop(var, None)
+# CRÍTICO: Limpiar variables de entorno problemáticas ANTES de importar SQLAlchemy
+# Estas variables pueden tener encoding incorrecto en Windows (misma lista que la app)
+from app.core.bootstrap import bootstrap_environment
 
-# Configurar encoding explícitamente
-os.environ['LANG'] = 'en_US.UTF-8'
-os.environ['LC_ALL'] = 'en_US.UTF-8'
+bootstrap_environment()
 os.environ['PYTHONIOENCODING'] = 'utf-8'
 
-from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
-from pathlib import Path
-
-# Add project root to path
-sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from app.core.config import get_settings
 from app.db.session import Base
@@ -78,9 +69,12 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        # Una transaccion por migracion: los autocommit_block de app.db.migrations
+        # (indices CONCURRENTLY, backfills por lotes) no comitean migraciones previas a medias
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            transaction_per_migration=True
         )
 
         with context.begin_transaction():
@@ -0,0 +1,32 @@
+"""Add task tombstones for delta sync
+
+Revision ID: 003_delta_sync
+Revises: 002_seed_data
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003_delta_sync'
+down_revision = '002_seed_data'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Los indices del delta sync, (owner, updated_at, id) y (owner, deleted_at, task_id),
+    # se crean en 007_task_owner (CONCURRENTLY), cuando ya existe owner_id
+    
+    # Create task_tombstones table
+    op.create_table(
+        'task_tombstones',
+        sa.Column('task_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('task_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('task_tombstones')
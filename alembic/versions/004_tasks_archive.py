@@ -0,0 +1,41 @@
+"""Add tasks_archive table for old completed tasks
+
+Revision ID: 004_tasks_archive
+Revises: 003_delta_sync
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '004_tasks_archive'
+down_revision = '003_delta_sync'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create tasks_archive table (reusa el enum taskstatus)
+    op.create_table(
+        'tasks_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('status', postgresql.ENUM('pending', 'in_progress', 'done', name='taskstatus', create_type=False), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # (owner, status, created_at) se crea en 007_task_owner
+
+
+def downgrade() -> None:
+    # Devuelve las tareas archivadas a la tabla principal antes de borrar
+    op.execute(
+        "INSERT INTO tasks (id, title, description, status, created_at, updated_at) "
+        "SELECT id, title, description, status, created_at, updated_at FROM tasks_archive"
+    )
+    op.drop_table('tasks_archive')
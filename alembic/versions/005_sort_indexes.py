@@ -0,0 +1,28 @@
+"""Drop the created_at index (sorts are indexed per owner in 007)
+
+Revision ID: 005_sort_indexes
+Revises: 004_tasks_archive
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '005_sort_indexes'
+down_revision = '004_tasks_archive'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Los indices (owner, campo, id) de cada ordenamiento se crean en 007_task_owner;
+    # crear aqui los globales (campo, id) solo para que 007 los borre costaria tres builds
+    # (created_at) queda cubierto por (owner, created_at, id)
+    drop_index_concurrently('ix_tasks_created_at', 'tasks')
+
+
+def downgrade() -> None:
+    create_index_concurrently('ix_tasks_created_at', 'tasks', ['created_at'])
@@ -0,0 +1,28 @@
+"""Add tags array column to tasks
+
+Revision ID: 006_task_tags
+Revises: 005_sort_indexes
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '006_task_tags'
+down_revision = '005_sort_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Default constante: en Postgres 11+ no reescribe la tabla
+    op.add_column('tasks', sa.Column('tags', postgresql.ARRAY(sa.Text()), server_default='{}', nullable=False))
+    op.add_column('tasks_archive', sa.Column('tags', postgresql.ARRAY(sa.Text()), server_default='{}', nullable=False))
+    # El GIN (owner_id, tags) se crea en 012_owner_tags_index, cuando ya existe owner_id
+
+
+def downgrade() -> None:
+    op.drop_column('tasks_archive', 'tags')
+    op.drop_column('tasks', 'tags')
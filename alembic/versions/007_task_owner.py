@@ -0,0 +1,78 @@
+"""Add task ownership and owner-scoped composite indexes
+
+Revision ID: 007_task_owner
+Revises: 006_task_tags
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import (
+    DEFAULT_LOCK_TIMEOUT, batched_backfill, create_index_concurrently, drop_index_concurrently, set_not_null
+)
+
+
+# revision identifiers, used by Alembic.
+revision = '007_task_owner'
+down_revision = '006_task_tags'
+branch_labels = None
+depends_on = None
+
+# Clave del backfill por tabla (task_tombstones no tiene id)
+OWNED_TABLES = {'tasks': 'id', 'tasks_archive': 'id', 'task_tombstones': 'task_id'}
+
+
+def _add_owner_foreign_key(table: str) -> None:
+    #FK NOT VALID (sin recorrer la tabla) + VALIDATE, que no bloquea escrituras
+    constraint = f'fk_{table}_owner_id_users'
+    with op.get_context().autocommit_block():
+        op.execute(f"SET lock_timeout = '{DEFAULT_LOCK_TIMEOUT}'")
+        try:
+            op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}")
+            op.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {constraint} FOREIGN KEY (owner_id) "
+                "REFERENCES users (id) ON DELETE CASCADE NOT VALID"
+            )
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}")
+        finally:
+            op.execute("RESET lock_timeout")
+
+
+def upgrade() -> None:
+    # owner_id en tasks, tasks_archive y task_tombstones; las filas existentes
+    # pasan al primer usuario (el usuario inicial). Todo es relanzable: si falla
+    # a mitad, la siguiente corrida retoma el backfill donde quedo
+    for table, key in OWNED_TABLES.items():
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS owner_id INTEGER")  # solo metadata
+        batched_backfill(table, "owner_id = (SELECT min(id) FROM users)", "owner_id IS NULL", key=key)
+        set_not_null(table, 'owner_id')
+        _add_owner_foreign_key(table)
+    
+    # Indices por usuario reemplazan los globales de 001 (003-006 ya no crean globales)
+    create_index_concurrently('ix_tasks_owner_created_at_id', 'tasks', ['owner_id', 'created_at', 'id'])
+    create_index_concurrently('ix_tasks_owner_updated_at_id', 'tasks', ['owner_id', 'updated_at', 'id'])
+    create_index_concurrently('ix_tasks_owner_title_id', 'tasks', ['owner_id', 'title', 'id'])
+    create_index_concurrently('ix_tasks_owner_status_id', 'tasks', ['owner_id', 'status', 'id'])
+    create_index_concurrently('ix_tasks_owner_status_created_at_id', 'tasks', ['owner_id', 'status', 'created_at', 'id'])
+    drop_index_concurrently('ix_tasks_status_created_at', 'tasks')
+    drop_index_concurrently('ix_tasks_status', 'tasks')
+    
+    create_index_concurrently('ix_tasks_archive_owner_status_created_at', 'tasks_archive', ['owner_id', 'status', 'created_at'])
+    create_index_concurrently('ix_task_tombstones_owner_deleted_at_task_id', 'task_tombstones', ['owner_id', 'deleted_at', 'task_id'])
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_task_tombstones_owner_deleted_at_task_id', 'task_tombstones')
+    drop_index_concurrently('ix_tasks_archive_owner_status_created_at', 'tasks_archive')
+    
+    create_index_concurrently('ix_tasks_status', 'tasks', ['status'])
+    create_index_concurrently('ix_tasks_status_created_at', 'tasks', ['status', 'created_at'])
+    drop_index_concurrently('ix_tasks_owner_status_created_at_id', 'tasks')
+    drop_index_concurrently('ix_tasks_owner_status_id', 'tasks')
+    drop_index_concurrently('ix_tasks_owner_title_id', 'tasks')
+    drop_index_concurrently('ix_tasks_owner_updated_at_id', 'tasks')
+    drop_index_concurrently('ix_tasks_owner_created_at_id', 'tasks')
+    
+    for table in reversed(list(OWNED_TABLES)):
+        op.drop_constraint(f'fk_{table}_owner_id_users', table, type_='foreignkey')
+        op.drop_column(table, 'owner_id')
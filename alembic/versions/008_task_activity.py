@@ -0,0 +1,47 @@
+"""Add daily task activity rollup table
+
+Revision ID: 008_task_activity
+Revises: 007_task_owner
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_task_activity'
+down_revision = '007_task_owner'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_activity_daily',
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('created_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('completed_count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], name='fk_task_activity_daily_owner_id_users', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('owner_id', 'day')
+    )
+    
+    # Carga inicial desde las tareas existentes (completadas aproximadas por updated_at)
+    op.execute("""
+        INSERT INTO task_activity_daily (owner_id, day, created_count, completed_count)
+        SELECT owner_id, day, sum(created), sum(completed)
+        FROM (
+            SELECT owner_id, (created_at AT TIME ZONE 'UTC')::date AS day, 1 AS created, 0 AS completed FROM tasks
+            UNION ALL
+            SELECT owner_id, (updated_at AT TIME ZONE 'UTC')::date, 0, 1 FROM tasks WHERE status = 'done'
+            UNION ALL
+            SELECT owner_id, (created_at AT TIME ZONE 'UTC')::date, 1, 0 FROM tasks_archive
+            UNION ALL
+            SELECT owner_id, (updated_at AT TIME ZONE 'UTC')::date, 0, 1 FROM tasks_archive WHERE status = 'done'
+        ) AS events
+        GROUP BY owner_id, day
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('task_activity_daily')
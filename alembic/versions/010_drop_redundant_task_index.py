@@ -0,0 +1,27 @@
+"""Drop ix_tasks_id (duplicates the primary key index)
+
+Revision ID: 010_drop_redundant_task_index
+Revises: 009_revoked_tokens
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '010_drop_redundant_task_index'
+down_revision = '009_revoked_tokens'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # tasks_pkey ya indexa id: ix_tasks_id solo agregaba una escritura por INSERT
+    # (ix_tasks_status ya se elimino en 007_task_owner)
+    drop_index_concurrently('ix_tasks_id', 'tasks')
+
+
+def downgrade() -> None:
+    create_index_concurrently('ix_tasks_id', 'tasks', ['id'])
@@ -0,0 +1,29 @@
+"""Owner + status indexes for every allowed sort (field, id)
+
+Revision ID: 011_status_sort_indexes
+Revises: 010_drop_redundant_task_index
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '011_status_sort_indexes'
+down_revision = '010_drop_redundant_task_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Con filtro por status cada sort necesita (owner, status, campo, id): el id desempata.
+    # (owner, status, created_at, id) ya lo crea 007_task_owner
+    create_index_concurrently('ix_tasks_owner_status_updated_at_id', 'tasks', ['owner_id', 'status', 'updated_at', 'id'])
+    create_index_concurrently('ix_tasks_owner_status_title_id', 'tasks', ['owner_id', 'status', 'title', 'id'])
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_tasks_owner_status_title_id', 'tasks')
+    drop_index_concurrently('ix_tasks_owner_status_updated_at_id', 'tasks')
@@ -0,0 +1,29 @@
+"""Owner-leading GIN index for tag filters
+
+Revision ID: 012_owner_tags_index
+Revises: 011_status_sort_indexes
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '012_owner_tags_index'
+down_revision = '011_status_sort_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # btree_gin da operadores GIN para integer: owner_id = x y tags && / @> en un solo
+    # scan del indice. Todos los filtros por tags van por owner_id, asi que no hay GIN global
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    create_index_concurrently('ix_tasks_owner_tags', 'tasks', ['owner_id', 'tags'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    # La extension se deja: puede haber otros objetos que dependan de ella
+    drop_index_concurrently('ix_tasks_owner_tags', 'tasks')
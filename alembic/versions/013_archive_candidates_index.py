@@ -0,0 +1,30 @@
+"""Partial index for the archive job candidates
+
+Revision ID: 013_archive_candidates_index
+Revises: 012_owner_tags_index
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '013_archive_candidates_index'
+down_revision = '012_owner_tags_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # archive-tasks busca done + updated_at < corte en todos los usuarios: ningun indice
+    # (owner_id, ...) sirve y cada lote recorria tasks_pkey desde el principio
+    create_index_concurrently(
+        'ix_tasks_done_updated_at_id', 'tasks', ['updated_at', 'id'],
+        postgresql_where=sa.text("status = 'done'")
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_tasks_done_updated_at_id', 'tasks')
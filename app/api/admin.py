@@ -0,0 +1,45 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+
+from app.core.bootstrap import startup_report
+from app.core.profiling import profile_store
+from app.core.security import get_current_admin
+from app.core.tracing import traced
+from app.models.user import User
+from app.schemas.admin import ProfileInfo, StartupInfo
+
+router = APIRouter()
+
+
+@router.get("/profiles", response_model=list[ProfileInfo])
+@traced()
+def list_profiles(
+    limit: int = Query(50, ge=1, le=500, description="Number of profiles, newest first"),
+    current_user: User = Depends(get_current_admin)
+):
+    #Perfiles recientes de todos los workers que comparten PROFILING_DIR
+    return profile_store.list(limit)
+
+
+@router.get("/profiles/{profile_id}")
+@traced()
+def download_profile(
+    profile_id: str,
+    current_user: User = Depends(get_current_admin)
+):
+    #Archivo pstats o speedscope del perfil
+    path = profile_store.path_for(profile_id)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile {profile_id} not found"
+        )
+    return FileResponse(path, filename=os.path.basename(path))
+
+
+@router.get("/startup", response_model=StartupInfo)
+@traced()
+def startup_timings(current_user: User = Depends(get_current_admin)):
+    #Cuanto tardo cada paso del arranque de este worker (import, engine, crypto...)
+    return startup_report.as_dict()
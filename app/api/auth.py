@@ -3,16 +3,19 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.core.security import create_access_token
+from app.core.security import create_access_token, get_current_user, get_token_payload
+from app.core.tracing import traced
 from app.db.session import get_db
+from app.models.user import User
 from app.schemas.user import LoginRequest, Token
-from app.services.user_service import authenticate_user
+from app.services.user_service import authenticate_user, revoke_token
 
 router = APIRouter()
 settings = get_settings()
 
 
 @router.post("/login", response_model=Token, status_code=status.HTTP_200_OK)
+@traced()
 def login(
     login_data: LoginRequest,
     db: Session = Depends(get_db)
@@ -36,3 +39,14 @@ def login(
     )
     
     return Token(access_token=access_token, token_type="bearer")
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+@traced()
+def logout(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    #Revoca el token usado en la request; deja de servir en todos los workers
+    revoke_token(db, current_user.id, payload)
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+
+from app.core.security import get_current_user
+from app.core.tracing import traced
+from app.db.session import get_db
+from app.models.user import User
+from app.schemas.batch import BatchRequest, BatchResponse
+from app.services import batch_service
+
+router = APIRouter()
+
+
+@router.post(
+    "",
+    response_model=BatchResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Run several task operations in one transaction"
+)
+@traced()
+def run_batch(
+    batch: BatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Ordered creates/updates/deletes with one auth check and one commit"""
+    committed, results = batch_service.run_batch(db, current_user.id, batch.operations, batch.mode)
+    return BatchResponse(committed=committed, results=results)
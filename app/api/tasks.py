@@ -1,16 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, Callable
 from math import ceil
 
+from app.core.config import get_settings
+from app.core.idempotency import idempotency_store
 from app.core.security import get_current_user
+from app.core.tracing import traced
 from app.db.session import get_db
 from app.models.user import User
 from app.models.task import TaskStatus
-from app.schemas.task import TaskCreate, TaskUpdate, TaskResponse, TaskListResponse
-from app.services import task_service
+from app.schemas.task import (
+    TaskCreate, TaskUpdate, TaskResponse, TaskListResponse, TaskChangesResponse,
+    TaskBatchGetRequest, TaskBatchGetResponse, TaskSort, TagMatch,
+    ActivityBucket, TaskActivityResponse, TaskActivityItem
+)
+from app.services import task_service, sync_service, activity_service
+from app.services.event_service import task_event_broadcaster, Subscriber, DROPPED
 
 router = APIRouter()
+settings = get_settings()
+
+
+def _run_idempotent(
+    idempotency_key: Optional[str],
+    scope: str,
+    payload: str,
+    response: Response,
+    func: Callable[[], TaskResponse]
+) -> TaskResponse:
+    #Sin header se ejecuta normal; con header se guarda/reproduce la respuesta
+    if not idempotency_key:
+        return func()
+    result, replayed = idempotency_store.run(f"{scope}:{idempotency_key}", payload, func)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 
 @router.post(
@@ -19,12 +47,55 @@ router = APIRouter()
     status_code=status.HTTP_201_CREATED,
     summary="Create a new task"
 )
+@traced()
 def create_task(
     task: TaskCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Create a task; repeats with the same Idempotency-Key replay the first response"""
+    return _run_idempotent(
+        idempotency_key,
+        f"{current_user.id}:POST:tasks",
+        task.model_dump_json(),
+        response,
+        lambda: TaskResponse.model_validate(task_service.create_task(db, current_user.id, task))
+    )
+
+
+@router.post(
+    "/batch-get",
+    response_model=TaskBatchGetResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get several tasks by id"
+)
+@traced()
+def batch_get_tasks(
+    request: TaskBatchGetRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return task_service.create_task(db, task)
+    """Fetch up to BATCH_GET_MAX_IDS tasks in one query; unknown ids are listed in `missing`"""
+    tasks, missing = task_service.get_tasks_by_ids(db, current_user.id, request.ids)
+    return TaskBatchGetResponse(items=tasks, missing=missing)
+
+
+@router.post(
+    "/claim",
+    response_model=list[TaskResponse],
+    status_code=status.HTTP_200_OK,
+    summary="Claim the oldest pending tasks"
+)
+@traced()
+def claim_tasks(
+    n: int = Query(1, ge=1, le=settings.CLAIM_MAX_BATCH, description="Max number of tasks to claim"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Move up to n oldest pending tasks to in_progress; never hands out a task twice"""
+    return task_service.claim_tasks(db, current_user.id, n)
 
 
 @router.get(
@@ -33,21 +104,31 @@ def create_task(
     status_code=status.HTTP_200_OK,
     summary="Get paginated list of tasks"
 )
+@traced()
 def get_tasks(
     page: int = Query(1, ge=1, description="Page number (starts from 1)"),
     page_size: int = Query(10, ge=1, le=100, description="Number of items per page"),
     status: Optional[TaskStatus] = Query(None, description="Filter by status"),
+    include_archived: bool = Query(False, description="Also list archived (old done) tasks"),
+    sort: TaskSort = Query(TaskSort.CREATED_AT_DESC, description="Sort field, prefix with '-' for descending (id breaks ties)"),
+    tag: Optional[list[str]] = Query(None, description="Filter by tag (repeat for several tags)"),
+    tag_match: TagMatch = Query(TagMatch.ANY, description="any: at least one tag, all: every tag"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get paginated list of tasks with optional status filter"""
+    """Get paginated list of tasks with optional status and tag filters"""
     skip = (page - 1) * page_size
     
     tasks, total = task_service.get_tasks(
         db,
+        current_user.id,
         skip=skip,
         limit=page_size,
-        status_filter=status
+        status_filter=status,
+        include_archived=include_archived,
+        sort=sort,
+        tags=tag,
+        tag_match=tag_match
     )
     
     total_pages = ceil(total / page_size) if total > 0 else 0
@@ -61,18 +142,116 @@ def get_tasks(
     )
 
 
+@router.get(
+    "/changes",
+    response_model=TaskChangesResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get tasks changed or deleted since a sync token"
+)
+@traced()
+def get_changes(
+    since: Optional[str] = Query(None, description="Sync token from a previous response (omit for a full sync)"),
+    limit: int = Query(500, ge=1, le=settings.SYNC_MAX_PAGE_SIZE, description="Max items per stream"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delta sync: changed tasks, deleted ids and the token for the next call"""
+    tasks, tombstones, next_token, has_more = sync_service.get_changes(db, current_user.id, token=since, limit=limit)
+    
+    return TaskChangesResponse(
+        items=tasks,
+        deleted=tombstones,
+        next_token=next_token,
+        has_more=has_more
+    )
+
+
+async def _event_stream(request: Request, subscriber: Subscriber):
+    #Genera eventos SSE; heartbeat periodico y cierre si el cliente es lento
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.queue.get(),
+                    timeout=settings.TASK_STREAM_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if event is DROPPED:
+                # El cliente debe reconectar y resincronizar con /changes
+                yield "event: dropped\ndata: {}\n\n"
+                break
+            yield f"event: task\ndata: {event}\n\n"
+    finally:
+        task_event_broadcaster.unsubscribe(subscriber)
+
+
+@router.get(
+    "/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Stream task create/update/delete events (SSE)"
+)
+@traced()
+async def stream_tasks(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Server-Sent Events feed of task changes"""
+    # La sesion de get_current_user se cierra antes de empezar el stream
+    subscriber = task_event_broadcaster.subscribe(current_user.id)
+    return StreamingResponse(
+        _event_stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get(
+    "/activity",
+    response_model=TaskActivityResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get tasks created/completed per day or week"
+)
+@traced()
+def get_activity(
+    from_: Optional[date] = Query(None, alias="from", description="First day, UTC (default: ACTIVITY_DEFAULT_DAYS days before 'to')"),
+    to: Optional[date] = Query(None, description="Last day, UTC (default: today)"),
+    bucket: ActivityBucket = Query(ActivityBucket.DAY, description="day or week (weeks start on Monday)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Activity time series read from the daily rollup table"""
+    end = to or datetime.now(timezone.utc).date()
+    start = from_ or end - timedelta(days=settings.ACTIVITY_DEFAULT_DAYS - 1)
+    
+    buckets = activity_service.get_activity(db, current_user.id, start, end, bucket)
+    
+    return TaskActivityResponse(
+        bucket=bucket,
+        items=[
+            TaskActivityItem(start=day, created=created, completed=completed)
+            for day, created, completed in buckets
+        ]
+    )
+
+
 @router.get(
     "/{task_id}",
     response_model=TaskResponse,
     status_code=status.HTTP_200_OK,
     summary="Get a specific task"
 )
+@traced()
 def get_task(
     task_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return task_service.get_task(db, task_id)
+    return task_service.get_task(db, current_user.id, task_id)
 
 
 @router.put(
@@ -81,14 +260,23 @@ def get_task(
     status_code=status.HTTP_200_OK,
     summary="Update a task"
 )
+@traced()
 def update_task(
     task_id: int,
     task_update: TaskUpdate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update an existing task (partial update supported)"""
-    return task_service.update_task(db, task_id, task_update)
+    return _run_idempotent(
+        idempotency_key,
+        f"{current_user.id}:PUT:tasks/{task_id}",
+        task_update.model_dump_json(exclude_unset=True),
+        response,
+        lambda: TaskResponse.model_validate(task_service.update_task(db, current_user.id, task_id, task_update))
+    )
 
 
 @router.delete(
@@ -96,10 +284,11 @@ def update_task(
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete a task"
 )
+@traced()
 def delete_task(
     task_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    task_service.delete_task(db, task_id)
+    task_service.delete_task(db, current_user.id, task_id)
     return None
@@ -0,0 +1,81 @@
+"""
+Process bootstrap: environment cleanup, done once before the first DB
+connection, and the startup timing report of this worker.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+# Logger de uvicorn: el reporte sale junto a "Application startup complete"
+logger = logging.getLogger("uvicorn.error")
+
+# Variables con encoding incorrecto en Windows que rompen libpq/psycopg o la verificacion TLS
+PROBLEMATIC_VARS = [
+    'PGCLIENTENCODING', 'PGSSLMODE', 'PGSSLCERT', 'PGSSLKEY',
+    'PGSSLROOTCERT', 'PGPASSFILE', 'PGSERVICEFILE', 'PGOPTIONS',
+    'PGAPPNAME', 'CURL_CA_BUNDLE', 'SSL_CERT_FILE', 'REQUESTS_CA_BUNDLE'
+]
+
+_bootstrapped = False
+
+
+def bootstrap_environment() -> None:
+    #Limpia el entorno y fuerza UTF-8; idempotente, solo la primera llamada hace algo
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    for var in PROBLEMATIC_VARS:
+        os.environ.pop(var, None)
+    os.environ['LANG'] = 'en_US.UTF-8'
+    os.environ['LC_ALL'] = 'en_US.UTF-8'
+    _bootstrapped = True
+
+
+class StartupReport:
+    """
+    Wall time of each startup step, in order. Importing app.main is the
+    first step; the rest are recorded by the lifespan hook before the
+    worker accepts requests.
+    """
+
+    def __init__(self):
+        self.steps: list[tuple[str, float]] = []
+        self.ready_at: Optional[datetime] = None
+
+    def record(self, name: str, seconds: float) -> None:
+        self.steps.append((name, seconds))
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def ready(self) -> None:
+        self.ready_at = datetime.now(timezone.utc)
+        logger.info(
+            "Startup finished in %.1f ms (%s)",
+            self.total_ms(),
+            ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.steps)
+        )
+
+    def total_ms(self) -> float:
+        return round(sum(seconds for _, seconds in self.steps) * 1000, 2)
+
+    def as_dict(self) -> dict:
+        return {
+            "steps": [
+                {"name": name, "duration_ms": round(seconds * 1000, 2)}
+                for name, seconds in self.steps
+            ],
+            "total_ms": self.total_ms(),
+            "ready_at": self.ready_at,
+        }
+
+
+startup_report = StartupReport()
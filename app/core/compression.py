@@ -0,0 +1,165 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    # Opcional: `pip install brotli` habilita Content-Encoding: br
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Tipos que vale la pena comprimir (JPEG, PNG, zip... ya vienen comprimidos)
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+
+
+class Encoder:
+    """
+    Incremental gzip or brotli encoder. Each chunk is flushed, so streamed
+    responses (SSE, exports) reach the client as they are produced.
+    """
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 16 + MAX_WBITS: formato gzip (header + crc)
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + (self._compressor.finish() if final else self._compressor.flush())
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    #br si el cliente lo acepta y esta instalado, si no gzip; q=0 excluye
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of compressible content types. Complete responses
+    are compressed only from `minimum_size` bytes; streamed responses are
+    compressed chunk by chunk. Responses that already have Content-Encoding,
+    ask for no-transform or carry no body are sent untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    #Estado de una respuesta: se decide con el primer mensaje de body
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+
+    def _compressible(self, headers: Headers) -> bool:
+        status = self.start_message["status"]
+        if status < 200 or status in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", "").lower():
+            return False
+        return headers.get("content-type", "").lower().startswith(COMPRESSIBLE_TYPES)
+
+    def _start_encoding(self) -> MutableHeaders:
+        self.encoder = Encoder(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+        headers = MutableHeaders(raw=list(self.start_message.get("headers", [])))
+        self.start_message["headers"] = headers.raw
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        return headers
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Se retiene hasta ver el primer body (tamano y si es stream)
+            self.start_message = message
+            self.passthrough = not self._compressible(Headers(raw=message.get("headers", [])))
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            if self.start_message is not None:
+                await self._send(self.start_message)
+                self.start_message = None
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            if not more_body:
+                # Respuesta completa: solo si supera el umbral y de verdad se achica
+                if len(body) >= self.middleware.minimum_size:
+                    headers = self._start_encoding()
+                    compressed = self.encoder.compress(body, final=True)
+                    if len(compressed) < len(body):
+                        headers["Content-Length"] = str(len(compressed))
+                        await self._send(self.start_message)
+                        await self._send({"type": "http.response.body", "body": compressed})
+                        return
+                    del headers["Content-Encoding"]
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            # Stream: no se conoce el tamano final, se comprime por chunk
+            headers = self._start_encoding()
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self._send(self.start_message)
+            self.start_message = None
+
+        await self._send({
+            "type": "http.response.body",
+            "body": self.encoder.compress(body, final=not more_body),
+            "more_body": more_body,
+        })
@@ -1,5 +1,7 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -11,12 +13,42 @@ class Settings(BaseSettings):
     DB_NAME: str
     DB_USER: str
     DB_PASSWORD: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    # Prepared statements del servidor (psycopg): una query se prepara al ejecutarse
+    # DB_PREPARE_THRESHOLD veces en la misma conexion. Apagar detras de PgBouncer en modo transaction
+    DB_PREPARED_STATEMENTS: bool = True
+    DB_PREPARE_THRESHOLD: int = 2
+    DB_PREPARED_MAX: int = 200
+    
+    # Deadline por request (se aplica como statement_timeout)
+    REQUEST_DEADLINE_SECONDS: float = 5.0
+    # Overrides por ruta, clave "METODO /ruta" (en .env como JSON)
+    ROUTE_DEADLINES_SECONDS: dict[str, float] = {
+        "GET /api/v1/tasks": 3.0,
+        "GET /api/v1/tasks/activity": 3.0,
+        "GET /api/v1/tasks/changes": 15.0,
+        "POST /api/v1/batch": 15.0,
+    }
+    # statement_timeout se reenvia cuando el restante bajo al menos esto (ms): tolerancia vs round trips
+    DB_STATEMENT_TIMEOUT_SLACK_MS: int = 100
+    
+    # Costo de bcrypt (calibrar con `python manage.py calibrate-bcrypt`)
+    BCRYPT_ROUNDS: int = 12
     
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Revocacion de tokens (logout)
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_FP_RATE: float = 0.001
+    REVOCATION_SYNC_SECONDS: float = 2.0
+    REVOCATION_SYNC_OVERLAP_SECONDS: float = 10.0
+    REVOCATION_PRUNE_SECONDS: float = 300.0
+    
     # User
     INITIAL_USER_EMAIL: str
     INITIAL_USER_PASSWORD: str
@@ -24,7 +56,102 @@ class Settings(BaseSettings):
     # API
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Task Management API"
+
+    # Idempotency-Key
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_MAX_KEYS: int = 10000
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: float = 30.0
+    
+    # Delta sync
+    SYNC_MAX_PAGE_SIZE: int = 1000
+    # updated_at/deleted_at = now() de la transaccion, que abre al llegar la request y hace commit
+    # hasta su deadline despues: el lag debe cubrir el mayor deadline (None = ese + margen)
+    SYNC_SAFETY_LAG_SECONDS: Optional[float] = None
+    SYNC_COMMIT_MARGIN_SECONDS: float = 2.0
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+    
+    # Change feed (LISTEN/NOTIFY + SSE)
+    TASK_EVENTS_CHANNEL: str = "task_changes"
+    TASK_STREAM_QUEUE_SIZE: int = 100
+    TASK_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Tags
+    TASK_MAX_TAGS: int = 20
+    TASK_TAG_MAX_LENGTH: int = 50
+    
+    # Batch get
+    BATCH_GET_MAX_IDS: int = 100
+    
+    # Batch de operaciones
+    BATCH_MAX_OPERATIONS: int = 100
+    
+    # Claim de tareas (work queue)
+    CLAIM_MAX_BATCH: int = 100
     
+    # Archivo de tareas done
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_BATCH_SIZE: int = 1000
+    
+    # Rollups de actividad
+    ACTIVITY_DEFAULT_DAYS: int = 30
+    ACTIVITY_MAX_RANGE_DAYS: int = 366
+    
+    # Load shedding (requests en curso por grupo de rutas)
+    SHED_AUTH_MAX_IN_FLIGHT: int = 8
+    SHED_TASKS_MAX_IN_FLIGHT: int = 40
+    SHED_POOL_WAIT_THRESHOLD_SECONDS: float = 0.5
+    SHED_RETRY_AFTER_SECONDS: int = 1
+    
+    # Rate limiting (token bucket por IP o por usuario del JWT)
+    RATE_LIMIT_ENABLED: bool = True
+    # Prefijo de ruta -> (capacidad/rafaga, segundos para rellenarla); en .env como JSON
+    RATE_LIMITS: dict[str, tuple[int, float]] = {
+        "/api/v1/auth/login": (5, 60.0),
+        "/api/v1/tasks": (120, 60.0),
+        "/api/v1/batch": (30, 60.0),
+    }
+    # redis://[:password@]host:port/db para compartir buckets entre workers (vacio = en memoria)
+    RATE_LIMIT_STORE_URL: Optional[str] = None
+    # Incluye la espera por una de las RATE_LIMIT_STORE_POOL_SIZE conexiones del worker
+    RATE_LIMIT_STORE_TIMEOUT_SECONDS: float = 0.1
+    RATE_LIMIT_STORE_POOL_SIZE: int = 4
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+    # Con JWT valido tambien se limita la IP, con esta capacidad relativa (varios usuarios detras de un NAT)
+    RATE_LIMIT_IP_FACTOR: float = 4.0
+    
+    # Compresion de respuestas (gzip, br si esta instalado brotli)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Tracing (OpenTelemetry)
+    TRACING_ENABLED: bool = False
+    TRACING_SERVICE_NAME: str = "task-api"
+    # Fraccion de trazas nuevas que se guardan (acota el overhead en produccion)
+    TRACING_SAMPLE_RATIO: float = 0.1
+    # otlp: collector OTLP/HTTP / json: un span por linea en TRACING_JSON_PATH
+    TRACING_EXPORTER: str = "otlp"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_JSON_PATH: str = "traces.jsonl"
+
+    # Profiling bajo demanda (sampler estadistico por request)
+    PROFILING_ENABLED: bool = False
+    # Header X-Profile con este valor perfila la request (vacio = solo por muestreo)
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_SECONDS: float = 0.005
+    PROFILING_MAX_SECONDS: float = 30.0
+    # pstats (snakeviz, python -m pstats) o speedscope (https://www.speedscope.app)
+    PROFILING_FORMAT: str = "speedscope"
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 200
+
+    # Usuarios con acceso a /api/v1/admin (en .env como JSON)
+    ADMIN_EMAILS: list[str] = []
+
     # Configuración para cargar desde .env
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -33,6 +160,19 @@ class Settings(BaseSettings):
         extra="ignore"
     )
     
+    @model_validator(mode="after")
+    def check_sync_lag(self) -> "Settings":
+        #Al arrancar: un lag menor que un deadline pierde cambios del delta sync sin aviso
+        max_deadline = max([self.REQUEST_DEADLINE_SECONDS, *self.ROUTE_DEADLINES_SECONDS.values()])
+        if self.SYNC_SAFETY_LAG_SECONDS is None:
+            self.SYNC_SAFETY_LAG_SECONDS = max_deadline + self.SYNC_COMMIT_MARGIN_SECONDS
+        elif self.SYNC_SAFETY_LAG_SECONDS < max_deadline:
+            raise ValueError(
+                f"SYNC_SAFETY_LAG_SECONDS ({self.SYNC_SAFETY_LAG_SECONDS}) must be at least the largest "
+                f"request deadline ({max_deadline}): a write can commit that long after its updated_at"
+            )
+        return self
+    
     @property #Pasa a atributo la funcion
     def DATABASE_URL(self) -> str:
         #Construcción de URL
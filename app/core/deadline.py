@@ -0,0 +1,47 @@
+import time
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Nunca se manda 0: en Postgres statement_timeout = 0 desactiva el limite
+_MIN_TIMEOUT_MS = 1
+
+
+class RequestTimerMiddleware:
+    """Stamps when the request arrived, so the deadline also counts time spent queued."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["started_at"] = time.monotonic()
+        await self.app(scope, receive, send)
+
+
+def route_deadline(request: Request) -> float:
+    #Segundos totales para la ruta: override "METODO /ruta/{param}" o el default
+    route = request.scope.get("route")
+    if route is not None:
+        key = f"{request.method} {route.path}"
+        if key in settings.ROUTE_DEADLINES_SECONDS:
+            return settings.ROUTE_DEADLINES_SECONDS[key]
+    return settings.REQUEST_DEADLINE_SECONDS
+
+
+def remaining_ms(request: Request) -> int:
+    #Milisegundos que le quedan a la request (<= 0 si ya vencio)
+    started_at = getattr(request.state, "started_at", None)
+    if started_at is None:
+        started_at = request.state.started_at = time.monotonic()
+    elapsed = time.monotonic() - started_at
+    return int((route_deadline(request) - elapsed) * 1000)
+
+
+def statement_timeout_ms(request: Request) -> int:
+    #Para SET LOCAL statement_timeout: vale solo para la transaccion, la conexion vuelve al pool sin el limite
+    return max(remaining_ms(request), _MIN_TIMEOUT_MS)
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Marca de "todavia sin respuesta"
+_MISSING = object()
+
+
+class _Entry:
+    #Estado de una clave: huella del payload, evento de fin y respuesta guardada
+    __slots__ = ("fingerprint", "done", "response", "expires_at")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response: Any = _MISSING
+        self.expires_at = expires_at
+
+
+class IdempotencyStore:
+    """In-process store of responses keyed by Idempotency-Key (TTL bounded)."""
+
+    def __init__(self, ttl_seconds: int, max_keys: int, wait_timeout: float):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self.wait_timeout = wait_timeout
+        # Orden de insercion == orden de expiracion (TTL constante)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float) -> None:
+        #Elimina claves expiradas y las mas antiguas hasta dejar sitio para una nueva
+        # Las que siguen en curso nunca se expulsan: un reintento las ejecutaria dos veces
+        excess = len(self._entries) - self.max_keys + 1
+        victims = []
+        for key, entry in self._entries.items():
+            if entry.expires_at > now and excess <= 0:
+                break
+            if entry.done.is_set():
+                victims.append(key)
+                excess -= 1
+        for key in victims:
+            del self._entries[key]
+
+    def run(self, key: str, fingerprint: str, func: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Run `func` once per key and replay its response for repeats.
+        Returns (response, replayed). Concurrent duplicates wait for the first one.
+        """
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None or entry.expires_at <= now:
+                    # Solo se purga al insertar, para no expulsar la clave que se esta consultando
+                    self._purge(now)
+                    entry = self._entries.get(key)
+                if entry is None:
+                    if len(self._entries) >= self.max_keys:
+                        # Todas las claves estan en curso: mejor rechazar que perder una
+                        raise HTTPException(
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Too many Idempotency-Key requests in progress",
+                            headers={"Retry-After": "1"}
+                        )
+                    entry = _Entry(fingerprint, now + self.ttl_seconds)
+                    self._entries[key] = entry
+                    break
+
+            if entry.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used with a different request"
+                )
+
+            # Espera a que termine la primera peticion
+            if not entry.done.wait(self.wait_timeout):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress"
+                )
+            if entry.response is not _MISSING:
+                return entry.response, True
+            # La primera fallo y libero la clave: se reintenta
+
+        try:
+            response = func()
+        except BaseException:
+            # Los errores no se guardan, la clave queda libre para reintentar
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.done.set()
+            raise
+
+        entry.response = response
+        entry.done.set()
+        return response, False
+
+
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_keys=settings.IDEMPOTENCY_MAX_KEYS,
+    wait_timeout=settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS
+)
@@ -0,0 +1,147 @@
+import json
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy.pool import Pool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class PoolWaitTracker:
+    """Moving average of how long requests wait to get a DB connection."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._average = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        # Se llama desde el threadpool (get_db)
+        with self._lock:
+            self._average += self.alpha * (seconds - self._average)
+
+    @property
+    def average(self) -> float:
+        return self._average
+
+
+class Budget:
+    #Maximo de requests en curso para un grupo de rutas
+    __slots__ = ("name", "prefixes", "max_in_flight", "in_flight", "rejected")
+
+    def __init__(self, name: str, prefixes: tuple[str, ...], max_in_flight: int):
+        self.name = name
+        self.prefixes = prefixes
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.rejected = 0
+
+
+class LoadShedder:
+    """
+    Admission control shared by the middleware and /health. Each budget caps
+    its own in-flight requests; budgets that use the DB are also shed while
+    the pool is exhausted and connections take longer than
+    `pool_wait_threshold` seconds to get.
+    """
+
+    def __init__(
+        self,
+        budgets: list[Budget],
+        get_pool: Callable[[], Pool],
+        max_connections: int,
+        pool_wait: PoolWaitTracker,
+        pool_wait_threshold: float,
+        exclude: tuple[str, ...] = ()
+    ):
+        self.budgets = budgets
+        # Getter: el engine (y su pool) se crea en el arranque, despues que el shedder
+        self.get_pool = get_pool
+        self.max_connections = max_connections
+        self.pool_wait = pool_wait
+        self.pool_wait_threshold = pool_wait_threshold
+        self.exclude = exclude
+
+    def budget_for(self, path: str) -> Optional[Budget]:
+        if path.startswith(self.exclude):
+            return None
+        for budget in self.budgets:
+            if path.startswith(budget.prefixes):
+                return budget
+        return None
+
+    def pool_saturated(self) -> bool:
+        # Sin conexiones libres y esperando de mas por una: la cola ya se formo
+        pool_full = self.get_pool().checkedout() >= self.max_connections
+        return pool_full and self.pool_wait.average > self.pool_wait_threshold
+
+    def admit(self, budget: Budget) -> bool:
+        # El loop es single-thread: los contadores no necesitan lock
+        if budget.in_flight >= budget.max_in_flight or self.pool_saturated():
+            budget.rejected += 1
+            return False
+        budget.in_flight += 1
+        return True
+
+    def stats(self) -> dict:
+        #Estado para /health
+        return {
+            "saturated": self.pool_saturated() or any(
+                budget.in_flight >= budget.max_in_flight for budget in self.budgets
+            ),
+            "budgets": {
+                budget.name: {
+                    "in_flight": budget.in_flight,
+                    "max_in_flight": budget.max_in_flight,
+                    "rejected": budget.rejected
+                }
+                for budget in self.budgets
+            },
+            "pool": {
+                "checked_out": self.get_pool().checkedout(),
+                "max_connections": self.max_connections,
+                "avg_wait_ms": round(self.pool_wait.average * 1000, 2)
+            }
+        }
+
+
+class LoadSheddingMiddleware:
+    """Rejects requests with 503 + Retry-After before they queue for a worker thread or a DB connection."""
+
+    def __init__(self, app: ASGIApp, shedder: LoadShedder, retry_after: int):
+        self.app = app
+        self.shedder = shedder
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.shedder.budget_for(scope["path"])
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not self.shedder.admit(budget):
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.in_flight -= 1
+
+    async def _reject(self, send: Send) -> None:
+        body = json.dumps({"detail": "Service overloaded, retry later"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(self.retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+pool_wait_tracker = PoolWaitTracker()
@@ -0,0 +1,317 @@
+import json
+import logging
+import marshal
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Los handlers sync corren en el threadpool de AnyIO; cProfile solo ve el thread que lo activa
+_WORKER_THREAD_NAME = "AnyIO worker thread"
+# Thread esperando trabajo (worker en queue.get, event loop en select): no es tiempo de la request
+_IDLE_FRAMES = {("queue.py", "get"), ("selectors.py", "select")}
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+FrameKey = tuple[str, int, str]
+
+
+class StackSampler:
+    """
+    Statistical profiler: every `interval` seconds it records the Python
+    stack of the event loop thread and of the busy worker threads. Counts
+    are samples, not calls; time = samples * interval.
+    """
+
+    def __init__(self, loop_thread: int, interval: float, max_seconds: float):
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples: Counter[tuple[FrameKey, ...]] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def request_stop(self) -> None:
+        #Solo avisa; no espera a que termine el muestreo en curso
+        self._stop.set()
+
+    def stop(self) -> None:
+        self.request_stop()
+        self._thread.join()
+
+    def _run(self) -> None:
+        # Tope de duracion: un stream (SSE) perfilado no muestrea para siempre
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            workers = {thread.ident for thread in threading.enumerate() if thread.name == _WORKER_THREAD_NAME}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.loop_thread:
+                    root = ("~", 0, "<event loop>")
+                elif ident in workers:
+                    root = ("~", 0, "<worker threads>")
+                else:
+                    continue
+                stack = self._stack(frame)
+                if stack:
+                    self.samples[(root,) + stack] += 1
+
+    @staticmethod
+    def _stack(frame) -> tuple[FrameKey, ...]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        for filename, _, name in stack[:2]:
+            if (os.path.basename(filename), name) in _IDLE_FRAMES:
+                return ()
+        stack.reverse()
+        return tuple(stack)
+
+
+def to_speedscope(samples: Counter, interval: float, name: str) -> dict:
+    #Formato "sampled" de speedscope: frames compartidos + un peso por stack
+    frames: list[dict] = []
+    index: dict[FrameKey, int] = {}
+    stacks, weights = [], []
+    for stack, count in samples.items():
+        ids = []
+        for key in stack:
+            if key not in index:
+                index[key] = len(frames)
+                filename, line, func = key
+                frames.append({"name": func, "file": filename, "line": line})
+            ids.append(index[key])
+        stacks.append(ids)
+        weights.append(count * interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": settings.PROJECT_NAME,
+        "name": name,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": stacks,
+            "weights": weights,
+        }],
+    }
+
+
+def to_pstats(samples: Counter, interval: float) -> dict:
+    #Mismo dict que marshal-ea cProfile: key -> (cc, nc, tt, ct, callers)
+    stats: dict[FrameKey, list] = {}
+    for stack, count in samples.items():
+        seconds = count * interval
+        seen = set()
+        for depth, key in enumerate(stack):
+            entry = stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+            # Recursion: el tiempo acumulado se cuenta una vez por muestra
+            if key not in seen:
+                seen.add(key)
+                entry[0] += count
+                entry[1] += count
+                entry[3] += seconds
+            if depth:
+                caller = entry[4].setdefault(stack[depth - 1], [0, 0, 0.0, 0.0])
+                caller[0] += count
+                caller[1] += count
+                caller[3] += seconds
+                if depth == len(stack) - 1:
+                    caller[2] += seconds
+        stats[stack[-1]][2] += seconds
+    return {
+        key: (cc, nc, tt, ct, {caller: tuple(values) for caller, values in callers.items()})
+        for key, (cc, nc, tt, ct, callers) in stats.items()
+    }
+
+
+class ProfileStore:
+    """
+    Profiles on disk: `<id>.json` with the request metadata next to the
+    profile itself. Shared by every worker that points to the same
+    directory; only the newest `max_files` profiles are kept.
+    """
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(self, meta: dict, samples: Counter, interval: float, fmt: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if fmt == "pstats":
+            meta["file"] = f"{meta['id']}.pstats"
+            with open(os.path.join(self.directory, meta["file"]), "wb") as file:
+                marshal.dump(to_pstats(samples, interval), file)
+        else:
+            meta["file"] = f"{meta['id']}.speedscope.json"
+            profile = to_speedscope(samples, interval, f"{meta['method']} {meta['route'] or meta['path']}")
+            with open(os.path.join(self.directory, meta["file"]), "w", encoding="utf-8") as file:
+                json.dump(profile, file)
+        # La metadata al final: list() nunca ve un perfil a medio escribir
+        with open(os.path.join(self.directory, f"{meta['id']}.json"), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        self._prune()
+
+    def list(self, limit: int) -> list[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json") or not _PROFILE_ID.match(name[:-5]):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as file:
+                    profiles.append(json.load(file))
+            except (OSError, ValueError):
+                # Borrado por otro worker mientras se listaba
+                continue
+        profiles.sort(key=lambda meta: meta["created_at"], reverse=True)
+        return profiles[:limit]
+
+    def path_for(self, profile_id: str) -> Optional[str]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        for suffix in (".speedscope.json", ".pstats"):
+            path = os.path.join(self.directory, profile_id + suffix)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _prune(self) -> None:
+        for meta in self.list(limit=sys.maxsize)[self.max_files:]:
+            for name in (f"{meta['id']}.json", meta.get("file")):
+                if name:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when it carries `X-Profile: <PROFILING_TOKEN>` or when
+    it falls in PROFILING_SAMPLE_RATE. One profile at a time per worker; the
+    response gets `X-Profile-Id` and the profile is listed in
+    /api/v1/admin/profiles. Other requests served meanwhile share the event
+    loop and the threadpool, so their stacks can show up too: the metadata
+    records how many were in flight.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        token: Optional[str],
+        sample_rate: float,
+        interval: float,
+        max_seconds: float,
+        fmt: str
+    ):
+        if fmt not in ("pstats", "speedscope"):
+            raise ValueError(f"Unknown PROFILING_FORMAT: {fmt}")
+        self.app = app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.fmt = fmt
+        self._profiling = False
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    def _wants_profile(self, scope: Scope) -> bool:
+        if self.token:
+            for key, value in scope["headers"]:
+                if key == b"x-profile":
+                    return secrets.compare_digest(value, self.token.encode("latin-1"))
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            if self._profiling or not self._wants_profile(scope):
+                await self.app(scope, receive, send)
+                return
+            await self._profile(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Un perfil a la vez: dos samplers verian los mismos threads
+        self._profiling = True
+        self._peak_in_flight = self._in_flight
+        profile_id = uuid.uuid4().hex
+        status_code = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode("ascii"))
+                ]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval, self.max_seconds)
+        created_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.request_stop()
+            duration = time.perf_counter() - started
+            # El join espera el muestreo en curso (un recorrido de todos los stacks): fuera del event loop
+            try:
+                await run_in_threadpool(sampler.stop)
+            finally:
+                self._profiling = False
+            route = scope.get("route")
+            meta = {
+                "id": profile_id,
+                "created_at": created_at.isoformat(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route.path if route is not None else None,
+                "status_code": status_code,
+                "duration_ms": round(duration * 1000, 2),
+                "samples": sum(sampler.samples.values()),
+                "interval_ms": self.interval * 1000,
+                "format": self.fmt,
+                "concurrent_requests": self._peak_in_flight - 1,
+            }
+            # Fuera del event loop; la respuesta ya se envio
+            try:
+                await run_in_threadpool(self.store.save, meta, sampler.samples, self.interval, self.fmt)
+            except OSError:
+                logger.exception("Could not save profile %s", profile_id)
+
+
+profile_store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
@@ -0,0 +1,344 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class RateLimitRule:
+    #Bucket de `capacity` tokens que se rellena completo en `period` segundos
+    __slots__ = ("prefix", "capacity", "period", "rate")
+
+    def __init__(self, prefix: str, capacity: int, period: float):
+        self.prefix = prefix
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+
+
+# (key, capacidad, tokens por segundo)
+Bucket = tuple[str, float, float]
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets of this process, split in shards by key hash so each lock
+    and each LRU eviction only touches a fraction of the clients.
+    """
+
+    def __init__(self, shards: int, max_keys: int):
+        self._shards = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+
+    async def take(self, buckets: list[Bucket]) -> tuple[bool, list[float]]:
+        #Consume un token de cada bucket solo si todos tienen. Regresa (permitido, tokens que quedan en cada uno)
+        indexes = [hash(key) % len(self._shards) for key, _, _ in buckets]
+        now = time.monotonic()
+        # Locks en orden de shard: dos requests con los mismos buckets no se bloquean mutuamente
+        locks = [self._locks[index] for index in sorted(set(indexes))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            tokens = []
+            for (key, capacity, rate), index in zip(buckets, indexes):
+                available, updated_at = self._shards[index].pop(key, (capacity, now))
+                tokens.append(min(capacity, available + (now - updated_at) * rate))
+            allowed = all(available >= 1 for available in tokens)
+            if allowed:
+                tokens = [available - 1 for available in tokens]
+            for (key, _, _), index, available in zip(buckets, indexes, tokens):
+                shard = self._shards[index]
+                shard[key] = (available, now)
+                # LRU: un bucket ausente equivale a uno lleno, se descartan los mas viejos
+                while len(shard) > self._max_keys_per_shard:
+                    shard.popitem(last=False)
+        finally:
+            for lock in locks:
+                lock.release()
+        return allowed, tokens
+
+
+# Bucket atomico en el servidor; usa TIME de Redis para no depender del reloj de cada worker
+_TOKEN_BUCKET_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local allowed = 1
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens[i] = math.min(capacity, available + math.max(0, now - ts) * rate)
+    if tokens[i] < 1 then
+        allowed = 0
+    end
+end
+local reply = {allowed}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    if allowed == 1 then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens[i]), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil((capacity - tokens[i]) / rate * 1000) + 1000)
+    reply[i + 1] = tostring(tokens[i])
+end
+return reply
+"""
+
+
+class RespError(Exception):
+    #Respuesta de error del servidor (-ERR ...)
+    pass
+
+
+class RespConnection:
+    #Minimal RESP client over one asyncio connection, one command at a time
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    async def command(self, *args) -> object:
+        payload = [f"*{len(args)}\r\n".encode("ascii")]
+        for arg in args:
+            data = str(arg).encode("utf-8")
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._writer.write(b"".join(payload))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> object:
+        line = (await self._reader.readuntil(b"\r\n"))[:-2]
+        prefix, rest = line[:1], line[1:]
+        if prefix == b"+":
+            return rest.decode("utf-8")
+        if prefix == b"-":
+            raise RespError(rest.decode("utf-8"))
+        if prefix == b":":
+            return int(rest)
+        if prefix == b"$":
+            length = int(rest)
+            if length == -1:
+                return None
+            return (await self._reader.readexactly(length + 2))[:-2].decode("utf-8")
+        if prefix == b"*":
+            length = int(rest)
+            if length == -1:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class RedisBucketStore:
+    """
+    Token buckets shared by every worker, on any server that speaks the
+    Redis protocol (Redis, Valkey, KeyDB...). Up to `pool_size` connections
+    per worker, each running one command at a time; the bucket update runs
+    as a Lua script. `timeout` covers waiting for a free connection too.
+    """
+
+    def __init__(self, url: str, timeout: float, pool_size: int = 4, key_prefix: str = "ratelimit:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.key_prefix = key_prefix
+        self._sha = hashlib.sha1(_TOKEN_BUCKET_SCRIPT.encode("utf-8")).hexdigest()
+        self._idle: list[RespConnection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _connect(self) -> RespConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = RespConnection(reader, writer)
+        try:
+            if self.password:
+                await connection.command("AUTH", self.password)
+            if self.db:
+                await connection.command("SELECT", self.db)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    async def _eval(self, connection: RespConnection, buckets: list[Bucket]) -> list:
+        keys = [self.key_prefix + key for key, _, _ in buckets]
+        limits = [value for _, capacity, rate in buckets for value in (capacity, rate)]
+        try:
+            return await connection.command("EVALSHA", self._sha, len(keys), *keys, *limits)
+        except RespError as exc:
+            if not str(exc).startswith("NOSCRIPT"):
+                raise
+            # Primera vez en este servidor (o se reinicio): EVAL carga el script
+            return await connection.command("EVAL", _TOKEN_BUCKET_SCRIPT, len(keys), *keys, *limits)
+
+    async def _take(self, buckets: list[Bucket]) -> list:
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            try:
+                reply = await self._eval(connection, buckets)
+            except BaseException:
+                # La conexion puede quedar a mitad de una respuesta: se descarta
+                connection.close()
+                raise
+            self._idle.append(connection)
+        return reply
+
+    async def take(self, buckets: list[Bucket]) -> tuple[bool, list[float]]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        # El deadline incluye la espera por una conexion libre: una rafaga no hace cola sin limite
+        allowed, *tokens = await asyncio.wait_for(self._take(buckets), self.timeout)
+        return bool(allowed), [float(available) for available in tokens]
+
+
+class RateLimitMiddleware:
+    """
+    Token bucket per route rule and per client. A request with a valid JWT
+    takes from two buckets at once: its subject (the rule's capacity) and
+    its IP (`ip_factor` times the capacity, room for several users behind
+    one NAT); a stolen token used from many IPs, or many tokens from one IP,
+    still hit a limit. Anonymous requests only have the IP bucket. Answers
+    429 when any bucket is empty and adds RateLimit-* headers to every
+    limited route. If the shared store fails the request is let through
+    (fail open).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rules: list[RateLimitRule],
+        store,
+        trust_forwarded_for: bool = False,
+        ip_factor: float = 4.0
+    ):
+        self.app = app
+        # Prefijo mas largo primero
+        self.rules = sorted(rules, key=lambda rule: len(rule.prefix), reverse=True)
+        self.store = store
+        self.trust_forwarded_for = trust_forwarded_for
+        self.ip_factor = ip_factor
+
+    def _rule_for(self, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if path.startswith(rule.prefix):
+                return rule
+        return None
+
+    def _client_ip(self, scope: Scope, headers: dict) -> str:
+        if self.trust_forwarded_for and b"x-forwarded-for" in headers:
+            return headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _client_keys(self, scope: Scope) -> list[tuple[str, float]]:
+        #(key, factor de capacidad) de cada bucket que consume la request
+        from jose import JWTError, jwt
+
+        headers = dict(scope["headers"])
+        ip = self._client_ip(scope, headers)
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        if authorization.lower().startswith("bearer "):
+            try:
+                # Se verifica la firma: un sub inventado no abre buckets nuevos
+                payload = jwt.decode(authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+                if payload.get("sub"):
+                    # Bucket de IP propio del trafico autenticado: no comparte capacidad con el anonimo (login)
+                    return [(f"sub:{payload['sub']}", 1.0), (f"ip-auth:{ip}", self.ip_factor)]
+            except JWTError:
+                pass
+        return [(f"ip:{ip}", 1.0)]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._rule_for(scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        buckets = [
+            (f"{rule.prefix}:{key}", rule.capacity * factor, rule.rate * factor)
+            for key, factor in self._client_keys(scope)
+        ]
+        try:
+            allowed, tokens = await self.store.take(buckets)
+        except Exception:
+            logger.exception("Rate limit store unavailable, request allowed")
+            await self.app(scope, receive, send)
+            return
+
+        # Los headers describen el bucket mas cerca de agotarse
+        tightest = min(range(len(buckets)), key=lambda i: tokens[i] / buckets[i][1])
+        _, capacity, rate = buckets[tightest]
+        remaining = tokens[tightest]
+        headers = [
+            (b"ratelimit-limit", str(int(capacity)).encode("ascii")),
+            (b"ratelimit-remaining", str(int(remaining)).encode("ascii")),
+            # Segundos hasta que el bucket vuelva a estar lleno
+            (b"ratelimit-reset", str(math.ceil((capacity - remaining) / rate)).encode("ascii")),
+            (b"ratelimit-policy", ", ".join(
+                f"{int(capacity)};w={int(rule.period)}" for _, capacity, _ in buckets
+            ).encode("ascii")),
+        ]
+
+        if not allowed:
+            body = json.dumps({"detail": "Rate limit exceeded"}).encode("utf-8")
+            # Hasta que todos los buckets vacios tengan un token
+            retry_after = max(1, max(
+                math.ceil((1 - available) / rate)
+                for (_, _, rate), available in zip(buckets, tokens) if available < 1
+            ))
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"retry-after", str(retry_after).encode("ascii")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def build_rate_limit_store():
+    #Redis-compatible si hay URL configurada, si no el store en memoria del proceso
+    if settings.RATE_LIMIT_STORE_URL:
+        return RedisBucketStore(
+            settings.RATE_LIMIT_STORE_URL,
+            timeout=settings.RATE_LIMIT_STORE_TIMEOUT_SECONDS,
+            pool_size=settings.RATE_LIMIT_STORE_POOL_SIZE
+        )
+    return InMemoryBucketStore(shards=settings.RATE_LIMIT_SHARDS, max_keys=settings.RATE_LIMIT_MAX_KEYS)
@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models.user import RevokedToken
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Bit array + k hashes: 'no' is certain, 'maybe' needs the exact set."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        # m = -n ln p / ln2^2, k = m/n ln2
+        self.size = max(8, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Doble hashing (Kirsch-Mitzenmacher) sobre un solo digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Revoked token ids of this worker. Reads are lock-free: a Bloom filter
+    answers most lookups, the exact dict (jti -> exp) confirms the rest.
+    A background thread pulls revocations made by other workers from the
+    revoked_tokens table and prunes tokens that already expired.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float, sync_interval: float, overlap: float, prune_interval: float):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.sync_interval = sync_interval
+        self.overlap = timedelta(seconds=overlap)
+        self.prune_interval = prune_interval
+        self._expires: dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, fp_rate)
+        self._lock = threading.Lock()
+        self._cursor: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_revoked(self, jti: str) -> bool:
+        if not self._bloom.might_contain(jti):
+            return False
+        return jti in self._expires
+
+    def add(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            if jti in self._expires:
+                return
+            self._expires[jti] = expires_at
+            self._bloom.add(jti)
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        #Quita los tokens ya expirados; el Bloom no borra, se reconstruye y se reemplaza
+        now = time.time() if now is None else now
+        with self._lock:
+            alive = {jti: exp for jti, exp in self._expires.items() if exp > now}
+            removed = len(self._expires) - len(alive)
+            if removed:
+                bloom = BloomFilter(max(self.capacity, 2 * len(alive)), self.fp_rate)
+                for jti in alive:
+                    bloom.add(jti)
+                # Primero el Bloom nuevo: un lector nunca ve un jti vivo fuera del filtro
+                self._bloom = bloom
+                self._expires = alive
+        return removed
+
+    def sync(self, db) -> int:
+        #Trae revocaciones nuevas de la tabla (solapando `overlap` por commits tardios)
+        query = select(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+        if self._cursor is None:
+            query = query.where(RevokedToken.expires_at > func.now())
+        else:
+            query = query.where(RevokedToken.revoked_at > self._cursor - self.overlap)
+        rows = db.execute(query).all()
+        for jti, expires_at, revoked_at in rows:
+            self.add(jti, expires_at.timestamp())
+            if self._cursor is None or revoked_at > self._cursor:
+                self._cursor = revoked_at
+        if self._cursor is None:
+            self._cursor = db.scalar(select(func.now()))
+        return len(rows)
+
+    def start(self) -> None:
+        # Carga inicial antes de atender requests; si falla la reintenta el thread
+        try:
+            with SessionLocal() as db:
+                self.sync(db)
+        except Exception:
+            logger.exception("Could not load revoked tokens, retrying in background")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="token-revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        last_prune = time.monotonic()
+        while not self._stop.wait(self.sync_interval):
+            try:
+                with SessionLocal() as db:
+                    self.sync(db)
+                    if time.monotonic() - last_prune >= self.prune_interval:
+                        last_prune = time.monotonic()
+                        self.prune()
+                        # Cualquier worker puede limpiar la tabla, el DELETE es idempotente
+                        db.execute(delete(RevokedToken).where(RevokedToken.expires_at < func.now()))
+                        db.commit()
+            except Exception:
+                logger.exception("Token revocation sync failed")
+
+
+revocation_list = RevocationList(
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    fp_rate=settings.REVOCATION_BLOOM_FP_RATE,
+    sync_interval=settings.REVOCATION_SYNC_SECONDS,
+    overlap=settings.REVOCATION_SYNC_OVERLAP_SECONDS,
+    prune_interval=settings.REVOCATION_PRUNE_SECONDS
+)
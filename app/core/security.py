@@ -1,35 +1,62 @@
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
+from app.core.revocation import revocation_list
+from app.core.tracing import traced
 from app.db.session import get_db
+from app.db.statements import user_by_email
 from app.models.user import User
 
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
 settings = get_settings()
 
-# Contexto hash
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=12
-)
+
+@lru_cache()
+def get_pwd_context() -> "CryptContext":
+    #Contexto hash, creado en el primer uso (passlib + bcrypt no se cargan al importar)
+    from passlib.context import CryptContext
+
+    # min = max = rounds: needs_update marca cualquier hash con otro costo (se rehashea en el login)
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+    )
+
+
+def warm_up_crypto() -> None:
+    #Lo llama el lifespan: la primera request no paga la carga de passlib, bcrypt y jose
+    # get_backend carga el modulo bcrypt (passlib lo difiere hasta el primer hash)
+    get_pwd_context().handler().get_backend()
+    import jose.jwt  # noqa: F401
 
 # Esquema portador de token HTTP
 security = HTTPBearer()
 
 
+@traced()
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar contraseña con hash"""
     # Truncar contraseña a 72 bytes para bcrypt
     #Verifico con hash
     if len(plain_password.encode('utf-8')) > 72:
         plain_password = plain_password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    #El hash guardado usa otro costo (u otro esquema) que el configurado
+    return get_pwd_context().needs_update(hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -37,11 +64,13 @@ def get_password_hash(password: str) -> str:
     #Truncar contraseña a 72 bytes para bcrypt
     if len(password.encode('utf-8')) > 72:
         password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     #Crear JWT
+    from jose import jwt
+
     to_encode = data.copy()
     
     if expires_delta:
@@ -49,14 +78,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # jti: id unico del token para poder revocarlo
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     
     return encoded_jwt
 
 
+@traced()
 def decode_token(token: str) -> dict:
     #Decode y verificacion de JWT
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
@@ -68,14 +101,28 @@ def decode_token(token: str) -> dict:
         )
 
 
+def get_token_payload(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    #Payload del JWT valido y no revocado (sin tocar la DB)
+    payload = decode_token(credentials.credentials)
+    
+    jti = payload.get("jti")
+    if jti is not None and revocation_list.is_revoked(jti):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+
+@traced()
 def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    payload: dict = Depends(get_token_payload),
     db: Session = Depends(get_db)
 ) -> User:
     #Obtener el usuario autenticado actual a partir del token JWT.
-    token = credentials.credentials
-    payload = decode_token(token)
-    
     email: str = payload.get("sub")
     if email is None:
         raise HTTPException(
@@ -84,7 +131,7 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.email == email).first()
+    user = db.scalars(user_by_email, {"email": email}).first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -93,3 +140,13 @@ def get_current_user(
         )
     
     return user
+
+
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    #Usuario autenticado con email en ADMIN_EMAILS
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
@@ -0,0 +1,46 @@
+import functools
+import inspect
+from typing import TYPE_CHECKING, Callable, Optional
+
+from app.core.config import get_settings
+
+if TYPE_CHECKING:
+    from opentelemetry.trace import Tracer
+
+settings = get_settings()
+
+
+@functools.lru_cache()
+def get_tracer() -> "Tracer":
+    # Sin TRACING_ENABLED no se configura el SDK y el API de OpenTelemetry es no-op
+    from opentelemetry import trace
+
+    return trace.get_tracer("task-api")
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Span around a function (sync or async). With tracing disabled the
+    function is returned untouched, so there is no per-call overhead and
+    OpenTelemetry is never imported.
+    """
+    def decorator(func: Callable) -> Callable:
+        if not settings.TRACING_ENABLED:
+            return func
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+        tracer = get_tracer()
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
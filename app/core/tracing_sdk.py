@@ -0,0 +1,134 @@
+"""
+OpenTelemetry SDK wiring: provider, exporters, SQL spans and the server
+span middleware. Only imported with TRACING_ENABLED, so a worker without
+tracing does not load the SDK nor the propagators.
+"""
+import json
+import threading
+from typing import Optional, Sequence
+
+from opentelemetry import trace
+from opentelemetry.propagate import extract
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, SimpleSpanProcessor, SpanExporter, SpanExportResult
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.tracing import get_tracer
+
+settings = get_settings()
+tracer = get_tracer()
+
+
+class JsonFileSpanExporter(SpanExporter):
+    """One JSON span per line, for tests and local debugging."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(json.loads(span.to_json())) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def setup_tracing() -> Optional[TracerProvider]:
+    #Configura el provider global segun Settings; None si el tracing esta apagado
+    if not settings.TRACING_ENABLED:
+        return None
+
+    # ParentBased: si el llamador ya decidio (traceparent) se respeta; si no, se muestrea por ratio
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO))
+    )
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)))
+    elif settings.TRACING_EXPORTER == "json":
+        # Sincrono: el span esta en el archivo apenas termina
+        provider.add_span_processor(SimpleSpanProcessor(JsonFileSpanExporter(settings.TRACING_JSON_PATH)))
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER}")
+
+    trace.set_tracer_provider(provider)
+    return provider
+
+
+def instrument_engine(engine: Engine) -> None:
+    #Un span CLIENT por statement SQL (hijo del span activo en ese thread)
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_sql_span(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        span = tracer.start_span(f"db.{operation}", kind=SpanKind.CLIENT)
+        span.set_attribute("db.system", "postgresql")
+        # Statement parametrizado: no lleva los valores
+        span.set_attribute("db.statement", statement)
+        conn.info.setdefault("tracing_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_sql_span(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("tracing_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def _fail_sql_span(exception_context):
+        spans = exception_context.connection.info.get("tracing_spans") if exception_context.connection else None
+        if spans:
+            span = spans.pop()
+            span.record_exception(exception_context.original_exception)
+            span.set_status(Status(StatusCode.ERROR))
+            span.end()
+
+
+class TracingMiddleware:
+    """
+    Server span per request, continuing the caller's trace (W3C traceparent).
+    Named after the route template once routing is done; the time between
+    the handler span and the end of this one is validation + serialization.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        with tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=extract(carrier),
+            kind=SpanKind.SERVER
+        ) as span:
+            span.set_attribute("http.method", scope["method"])
+            span.set_attribute("http.target", scope["path"])
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.update_name(f"{scope['method']} {route.path}")
+                    span.set_attribute("http.route", route.path)
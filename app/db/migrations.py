@@ -0,0 +1,142 @@
+"""
+Helpers for Alembic migrations that run while the API keeps serving.
+
+- Indexes are built/dropped with CONCURRENTLY, outside the migration
+  transaction (Postgres does not allow it inside one), so writes to the
+  table are not blocked during the build.
+- Data backfills go in small committed batches with a pause between them,
+  so no UPDATE holds row locks or bloats WAL for the whole table.
+- NOT NULL is added through a NOT VALID check constraint, validated
+  without blocking writes.
+"""
+import logging
+import time
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+logger = logging.getLogger("alembic.online")
+
+# Si otra transaccion retiene el lock de la tabla, la migracion falla en vez de encolar a todas las demas
+DEFAULT_LOCK_TIMEOUT = "5s"
+
+
+def _index_is_invalid(name: str) -> bool:
+    #Un CREATE INDEX CONCURRENTLY interrumpido deja el indice INVALID (existe pero no se usa)
+    if op.get_context().as_sql:
+        return False
+    return bool(op.get_bind().execute(
+        sa.text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+        ),
+        {"name": name}
+    ).scalar())
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    lock_timeout: str = DEFAULT_LOCK_TIMEOUT,
+    **kwargs
+) -> None:
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS. Re-running after a failed build
+    drops the invalid leftover first, so the migration can simply be retried.
+    Extra kwargs go to op.create_index (postgresql_using, postgresql_where...).
+    """
+    with op.get_context().autocommit_block():
+        if _index_is_invalid(name):
+            logger.info("Dropping invalid index %s left by a previous run", name)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.execute(f"SET lock_timeout = '{lock_timeout}'")
+        try:
+            op.create_index(
+                name, table, list(columns), unique=unique,
+                postgresql_concurrently=True, if_not_exists=True, **kwargs
+            )
+        finally:
+            op.execute("RESET lock_timeout")
+
+
+def drop_index_concurrently(name: str, table: str, lock_timeout: str = DEFAULT_LOCK_TIMEOUT) -> None:
+    #DROP INDEX CONCURRENTLY IF EXISTS: no bloquea lecturas ni escrituras de la tabla
+    with op.get_context().autocommit_block():
+        op.execute(f"SET lock_timeout = '{lock_timeout}'")
+        try:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        finally:
+            op.execute("RESET lock_timeout")
+
+
+def batched_backfill(
+    table: str,
+    set_clause: str,
+    where: str,
+    batch_size: int = 1000,
+    pause_seconds: float = 0.1,
+    key: str = "id",
+    start_after: Optional[int] = None
+) -> int:
+    """
+    UPDATE `table` SET `set_clause` for the rows matching `where`, in
+    batches of `batch_size` rows by `key` order, each one committed on its
+    own. `where` must stop matching once a row is done (e.g. "col IS NULL"),
+    which makes the backfill resumable: a rerun only finds the pending rows.
+    Returns the number of rows updated.
+    """
+    statement = sa.text(f"""
+        UPDATE {table} SET {set_clause}
+        WHERE {key} IN (
+            SELECT {key} FROM {table}
+            WHERE {key} > :after AND ({where})
+            ORDER BY {key}
+            LIMIT :batch_size
+        )
+        RETURNING {key}
+    """)
+
+    if op.get_context().as_sql:
+        # --sql: no hay resultados para avanzar el cursor, se emite un solo UPDATE
+        op.execute(f"UPDATE {table} SET {set_clause} WHERE {where}")
+        return 0
+
+    total = 0
+    after = start_after if start_after is not None else -2**63
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            # Autocommit: cada lote es su propia transaccion y suelta sus locks al terminar
+            keys = bind.execute(statement, {"after": after, "batch_size": batch_size}).scalars().all()
+            if not keys:
+                break
+            total += len(keys)
+            after = max(keys)
+            logger.info("Backfill %s: %d rows (last %s=%s)", table, total, key, after)
+            if pause_seconds:
+                # Throttling: deja respirar a la replicacion y al autovacuum
+                time.sleep(pause_seconds)
+    return total
+
+
+def set_not_null(table: str, column: str, lock_timeout: str = DEFAULT_LOCK_TIMEOUT) -> None:
+    """
+    SET NOT NULL without a long ACCESS EXCLUSIVE scan: a NOT VALID check is
+    validated first (only SHARE UPDATE EXCLUSIVE, writes continue), then
+    Postgres 12+ uses it to skip the scan of ALTER COLUMN ... SET NOT NULL.
+    """
+    constraint = f"ck_{table}_{column}_not_null"
+    with op.get_context().autocommit_block():
+        op.execute(f"SET lock_timeout = '{lock_timeout}'")
+        try:
+            op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}")
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} CHECK ({column} IS NOT NULL) NOT VALID")
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}")
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+            op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}")
+        finally:
+            op.execute("RESET lock_timeout")
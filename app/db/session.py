@@ -1,50 +1,117 @@
-import os
+import time
+from functools import lru_cache
+from typing import Optional
 
-# CRÍTICO: Limpiar variables ANTES de importar SQLAlchemy
-PROBLEMATIC_VARS = [
-    'PGCLIENTENCODING', 'PGSSLMODE', 'PGSSLCERT', 'PGSSLKEY',
-    'PGSSLROOTCERT', 'PGPASSFILE', 'PGSERVICEFILE', 'PGOPTIONS',
-    'PGAPPNAME', 'CURL_CA_BUNDLE', 'SSL_CERT_FILE', 'REQUESTS_CA_BUNDLE'
-]
-
-for var in PROBLEMATIC_VARS:
-    os.environ.pop(var, None)
-
-os.environ['LANG'] = 'en_US.UTF-8'
-os.environ['LC_ALL'] = 'en_US.UTF-8'
-
-# Ahora sí importar SQLAlchemy
-from sqlalchemy import create_engine
+from fastapi import HTTPException, Request, status
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from app.core.bootstrap import bootstrap_environment
 from app.core.config import get_settings
+from app.core.deadline import remaining_ms, statement_timeout_ms
+from app.core.load_shedding import pool_wait_tracker
 
 settings = get_settings()
 
-# Motor/Config/Conexion DB
-engine = create_engine(
-    settings.DATABASE_URL,
-    # Opciones de pool de conexiones
-    #Like tps
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
-)
+# Crea sesiones; get_engine() les asigna el engine
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+@lru_cache()
+def get_engine() -> Engine:
+    """
+    Engine shared by the process, created on first use (the lifespan hook
+    at startup, or the first manage.py command that needs the DB): importing
+    app modules does not load the psycopg dialect nor build the pool.
+    """
+    # Entorno limpio ANTES de la primera conexion
+    bootstrap_environment()
+
+    # Motor/Config/Conexion DB
+    engine = create_engine(
+        settings.DATABASE_URL,
+        # Opciones de pool de conexiones
+        #Like tps
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        # Falla rapido en vez de encolar 30s cuando el pool se agota
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        # None desactiva los prepared statements de psycopg
+        connect_args={
+            "prepare_threshold": settings.DB_PREPARE_THRESHOLD if settings.DB_PREPARED_STATEMENTS else None
+        }
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_prepared_max(dbapi_connection, connection_record):
+        # Cupo de statements preparados por conexion (cada combinacion de filtros/sort de la lista es uno)
+        dbapi_connection.prepared_max = settings.DB_PREPARED_MAX
+
+    SessionLocal.configure(bind=engine)
+    return engine
 
-# Crea sesiones 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Crea base de datos declarativas desde clases
 # Meta de tablas
 Base = declarative_base()
 
 
-def get_db():
+# set_config(..., true) = SET LOCAL, con el valor como parametro: el texto no cambia y se prepara
+_SET_STATEMENT_TIMEOUT = "SELECT set_config('statement_timeout', %(timeout)s, true)"
+
+
+class _StatementDeadline:
+    """
+    Keeps statement_timeout at the time the request has left, statement by
+    statement: each query may only use what the previous ones did not.
+    The value is re-sent only when it dropped by DB_STATEMENT_TIMEOUT_SLACK_MS
+    or more, so most statements cost no extra round trip.
+    """
+
+    def __init__(self, request: Request):
+        self.request = request
+        self.sent_ms: Optional[int] = None
+
+    def after_begin(self, session, transaction, connection) -> None:
+        # SET LOCAL termina con la transaccion: la siguiente lo vuelve a mandar
+        self.sent_ms = None
+        # Cada transaccion de la Session puede venir con otra Connection del pool
+        if not event.contains(connection, "before_cursor_execute", self.before_cursor_execute):
+            event.listen(connection, "before_cursor_execute", self.before_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        timeout_ms = statement_timeout_ms(self.request)
+        if self.sent_ms is not None and self.sent_ms - timeout_ms < settings.DB_STATEMENT_TIMEOUT_SLACK_MS:
+            return
+        # Por la conexion y no por `cursor`: este ejecuta el statement justo despues
+        cursor.connection.execute(_SET_STATEMENT_TIMEOUT, {"timeout": str(timeout_ms)})
+        self.sent_ms = timeout_ms
+
+
+def get_db(request: Request):
     #Dependency para obtener la sesion con DB.
     #Genera sesion y la cierra
+    if remaining_ms(request) <= 0:
+        # Vencio esperando turno: ni siquiera se pide conexion
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded"
+        )
+    
     db = SessionLocal()
+    # Cada statement de la request corre con el tiempo que le queda como statement_timeout
+    event.listen(db, "after_begin", _StatementDeadline(request).after_begin)
     try:
+        # Toma la conexion de entrada para medir la espera del pool (load shedding)
+        start = time.monotonic()
+        try:
+            db.connection()
+        finally:
+            # Tambien si vence DB_POOL_TIMEOUT_SECONDS: es justo la espera que mas importa
+            pool_wait_tracker.record(time.monotonic() - start)
         yield db
     finally:
         db.close()
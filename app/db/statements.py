@@ -0,0 +1,20 @@
+"""
+Precompiled statements for the hot queries. Built once with bindparams, so
+every call reuses the same object: SQLAlchemy skips rebuilding it and
+finds the compiled SQL in its cache right away, and the SQL text is always
+identical, which lets psycopg prepare it on the server.
+"""
+from sqlalchemy import bindparam, select
+
+from app.models.task import Task
+from app.models.user import User
+
+# get_current_user / authenticate_user
+user_by_email = select(User).where(User.email == bindparam("email")).limit(1)
+
+# get_task (y update/delete, que pasan por get_task)
+task_by_id = (
+    select(Task)
+    .where(Task.id == bindparam("task_id"), Task.owner_id == bindparam("owner_id"))
+    .limit(1)
+)
@@ -1,25 +1,73 @@
-import os
-import sys
+import time
 
-# Lista de variables problemáticas en Windows
-PROBLEMATIC_VARS = [
-    'PGCLIENTENCODING', 'PGSSLMODE', 'PGSSLCERT', 'PGSSLKEY',
-    'PGSSLROOTCERT', 'PGPASSFILE', 'PGSERVICEFILE', 'PGOPTIONS',
-    'PGAPPNAME', 'CURL_CA_BUNDLE', 'SSL_CERT_FILE', 'REQUESTS_CA_BUNDLE'
-]
+# Tiempo de importar la app (primer paso del reporte de arranque)
+_import_started = time.perf_counter()
 
-# Limpiar ANTES de importar cualquier cosa
-for var in PROBLEMATIC_VARS:
-    os.environ.pop(var, None)
+from contextlib import asynccontextmanager
 
-# Configurar encoding UTF-8
-os.environ['LANG'] = 'en_US.UTF-8'
-os.environ['LC_ALL'] = 'en_US.UTF-8'
-
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from app.api import admin, auth, tasks, batch
+from app.core.bootstrap import bootstrap_environment, startup_report
+from app.core.compression import CompressionMiddleware
+from app.core.config import get_settings
+from app.core.deadline import RequestTimerMiddleware
+from app.core.load_shedding import Budget, LoadShedder, LoadSheddingMiddleware, pool_wait_tracker
+from app.core.profiling import ProfilingMiddleware, profile_store
+from app.core.rate_limit import RateLimitMiddleware, RateLimitRule, build_rate_limit_store
+from app.core.revocation import revocation_list
+from app.core.security import warm_up_crypto
+from app.db.session import get_engine
+from app.services.event_service import task_event_broadcaster
+
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup in one pass, each step timed in the startup report: clean the
+    environment, configure tracing, build the engine and the crypto
+    contexts, load revoked tokens. Shutdown stops the background threads
+    and flushes the buffered spans.
+    """
+    with startup_report.step("environment"):
+        bootstrap_environment()
+
+    tracer_provider = None
+    if settings.TRACING_ENABLED:
+        with startup_report.step("tracing"):
+            from app.core.tracing_sdk import setup_tracing
+            tracer_provider = setup_tracing()
+
+    with startup_report.step("engine"):
+        engine = get_engine()
+        if tracer_provider is not None:
+            from app.core.tracing_sdk import instrument_engine
+            instrument_engine(engine)
+
+    # bcrypt/jose se cargan aca y no en el primer login
+    with startup_report.step("crypto"):
+        warm_up_crypto()
+
+    # Carga los tokens revocados y los mantiene sincronizados con los otros workers
+    with startup_report.step("revocation_sync"):
+        revocation_list.start()
+
+    startup_report.ready()
+    try:
+        yield
+    finally:
+        # Cierra la conexion LISTEN compartida y el thread de revocaciones
+        task_event_broadcaster.stop()
+        revocation_list.stop()
+        # Exporta los spans que quedaron en el buffer
+        if tracer_provider is not None:
+            tracer_provider.shutdown()
 
-from app.api import auth, tasks
 
 # Crear app
 app = FastAPI(
@@ -27,9 +75,65 @@ app = FastAPI(
     description="API REST para gestión de tareas con autenticación JWT",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
+)
+
+# Presupuestos separados: un pico de logins (bcrypt) no deja sin cupo a las tareas
+load_shedder = LoadShedder(
+    budgets=[
+        Budget("auth", ("/api/v1/auth/login",), settings.SHED_AUTH_MAX_IN_FLIGHT),
+        Budget("tasks", ("/api/v1/tasks", "/api/v1/batch"), settings.SHED_TASKS_MAX_IN_FLIGHT),
+    ],
+    get_pool=lambda: get_engine().pool,
+    max_connections=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    pool_wait=pool_wait_tracker,
+    pool_wait_threshold=settings.SHED_POOL_WAIT_THRESHOLD_SECONDS,
+    # El stream SSE es de larga duracion y no retiene conexion
+    exclude=("/api/v1/tasks/stream",)
+)
+
+# El mas interno: comprime solo lo que produce la app
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+
+# Dentro del load shedding: una request perfilada ocupa cupo como cualquier otra
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        token=settings.PROFILING_TOKEN,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        interval=settings.PROFILING_INTERVAL_SECONDS,
+        max_seconds=settings.PROFILING_MAX_SECONDS,
+        fmt=settings.PROFILING_FORMAT
+    )
+
+# Se agrega antes que CORS para que los 503 tambien lleven headers CORS
+app.add_middleware(
+    LoadSheddingMiddleware,
+    shedder=load_shedder,
+    retry_after=settings.SHED_RETRY_AFTER_SECONDS
 )
 
+# Fuera del load shedding: el trafico abusivo se corta antes de ocupar cupo
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=[
+            RateLimitRule(prefix, capacity, period)
+            for prefix, (capacity, period) in settings.RATE_LIMITS.items()
+        ],
+        store=build_rate_limit_store(),
+        trust_forwarded_for=settings.RATE_LIMIT_TRUST_FORWARDED_FOR,
+        ip_factor=settings.RATE_LIMIT_IP_FACTOR
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -38,17 +142,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Ultimo en agregarse = el mas externo: el deadline cuenta desde que llega la request
+app.add_middleware(RequestTimerMiddleware)
+
+# El span del servidor envuelve todo, incluidos los 429/503 de los middlewares
+if settings.TRACING_ENABLED:
+    from app.core.tracing_sdk import TracingMiddleware
+    app.add_middleware(TracingMiddleware)
+
 # routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(tasks.router, prefix="/api/v1/tasks", tags=["Tasks"])
+app.include_router(batch.router, prefix="/api/v1/batch", tags=["Batch"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """No DB connection within DB_POOL_TIMEOUT_SECONDS"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service overloaded, retry later"},
+        headers={"Retry-After": str(settings.SHED_RETRY_AFTER_SECONDS)}
+    )
+
+
+@app.exception_handler(OperationalError)
+async def statement_timeout_handler(request: Request, exc: OperationalError):
+    """Statement cancelled by the route deadline (statement_timeout) -> 504"""
+    # psycopg ya esta cargado: lo importo el engine
+    from psycopg.errors import QueryCanceled
+
+    if not isinstance(exc.orig, QueryCanceled):
+        raise exc
+    # get_db cierra la sesion: rollback y la conexion vuelve limpia al pool
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "Request deadline exceeded"}
+    )
+
 
 # Health check
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
+    load = load_shedder.stats()
     return {
-        "status": "healthy",
-        "service": "Task Management API"
+        "status": "saturated" if load["saturated"] else "healthy",
+        "service": "Task Management API",
+        "load": load
     }
 
 @app.get("/")
@@ -59,3 +201,6 @@ def root():
         "docs": "/docs",
         "redoc": "/redoc"
     }
+
+
+startup_report.record("import", time.perf_counter() - _import_started)
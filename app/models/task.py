@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Enum, DateTime, Index
+from sqlalchemy import Column, Integer, String, Text, Enum, Date, DateTime, Index, ForeignKey, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.sql import func
 import enum
 from app.db.session import Base
@@ -15,17 +16,88 @@ class Task(Base):
     
     __tablename__ = "tasks"
     
-    id = Column(Integer, primary_key=True, index=True)
+    # La PK ya tiene indice (tasks_pkey)
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String(255), nullable=False, index=False)
     description = Column(Text, nullable=True)
-    status = Column(Enum(TaskStatus, values_callable=lambda x: [e.value for e in x]), default=TaskStatus.PENDING, nullable=False, index=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    status = Column(Enum(TaskStatus, values_callable=lambda x: [e.value for e in x]), default=TaskStatus.PENDING, nullable=False)
+    tags = Column(ARRAY(Text), server_default="{}", nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
-    # indice compuesto que Filtra por status y ordena por fecha
+    # Todas las queries van por owner_id: cada indice empieza por owner_id
+    # (owner, campo, id) por cada ordenamiento permitido (id desempata);
+    # (owner, status, campo, id) lo mismo con filtro por status (lista y claim);
+    # (owner, updated_at, id) ademas soporta el delta sync por keyset
     __table_args__ = (
-        Index('ix_tasks_status_created_at', 'status', 'created_at'),
+        Index('ix_tasks_owner_created_at_id', 'owner_id', 'created_at', 'id'),
+        Index('ix_tasks_owner_updated_at_id', 'owner_id', 'updated_at', 'id'),
+        Index('ix_tasks_owner_title_id', 'owner_id', 'title', 'id'),
+        Index('ix_tasks_owner_status_id', 'owner_id', 'status', 'id'),
+        Index('ix_tasks_owner_status_created_at_id', 'owner_id', 'status', 'created_at', 'id'),
+        Index('ix_tasks_owner_status_updated_at_id', 'owner_id', 'status', 'updated_at', 'id'),
+        Index('ix_tasks_owner_status_title_id', 'owner_id', 'status', 'title', 'id'),
+        # GIN (owner, tags) para filtros por tags (&& any, @> all); owner_id via btree_gin
+        Index('ix_tasks_owner_tags', 'owner_id', 'tags', postgresql_using='gin'),
+        # Unico sin owner_id: candidatos de archive-tasks (todos los usuarios), en orden de keyset
+        Index('ix_tasks_done_updated_at_id', 'updated_at', 'id', postgresql_where=text("status = 'done'")),
     )
     
     def __repr__(self):
         return f"<Task(id={self.id}, title={self.title}, status={self.status})>"
+
+
+class TaskTombstone(Base):
+    #Registro de tareas eliminadas para que los clientes detecten borrados
+    
+    __tablename__ = "task_tombstones"
+    
+    task_id = Column(Integer, primary_key=True, autoincrement=False)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index('ix_task_tombstones_owner_deleted_at_task_id', 'owner_id', 'deleted_at', 'task_id'),
+    )
+    
+    def __repr__(self):
+        return f"<TaskTombstone(task_id={self.task_id}, deleted_at={self.deleted_at})>"
+
+
+class TaskArchive(Base):
+    #Tareas done antiguas movidas fuera de la tabla caliente `tasks` (mismo id)
+    
+    __tablename__ = "tasks_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    status = Column(Enum(TaskStatus, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    tags = Column(ARRAY(Text), server_default="{}", nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index('ix_tasks_archive_owner_status_created_at', 'owner_id', 'status', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<TaskArchive(id={self.id}, title={self.title}, status={self.status})>"
+
+
+class TaskActivity(Base):
+    #Rollup diario por usuario: tareas creadas y completadas (pasan a done) ese dia (UTC)
+    
+    __tablename__ = "task_activity_daily"
+    
+    # La PK (owner_id, day) es el indice de lectura por rango de fechas
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    created_count = Column(Integer, server_default="0", nullable=False)
+    completed_count = Column(Integer, server_default="0", nullable=False)
+    
+    def __repr__(self):
+        return f"<TaskActivity(owner_id={self.owner_id}, day={self.day}, created={self.created_count}, completed={self.completed_count})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -15,4 +15,24 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     #Depuracion o logs
     def __repr__(self):
-        return f"<User(id={self.id}, email={self.email})>"
\ No newline at end of file
+        return f"<User(id={self.id}, email={self.email})>"
+
+
+class RevokedToken(Base):
+    #JWT revocados antes de su exp (logout); se borran cuando el token expira
+    
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # revoked_at: sync incremental entre workers / expires_at: carga inicial y limpieza
+    __table_args__ = (
+        Index('ix_revoked_tokens_revoked_at', 'revoked_at'),
+        Index('ix_revoked_tokens_expires_at', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f"<RevokedToken(jti={self.jti}, user_id={self.user_id})>"
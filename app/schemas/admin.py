@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+#Esquemas de los endpoints de administracion
+
+
+class ProfileInfo(BaseModel):
+    #Metadata de un perfil guardado por ProfilingMiddleware
+    id: str
+    created_at: datetime
+    method: str
+    path: str
+    route: Optional[str]
+    status_code: int
+    duration_ms: float
+    samples: int
+    interval_ms: float
+    format: str
+    concurrent_requests: int
+    file: str
+
+
+class StartupStep(BaseModel):
+    name: str
+    duration_ms: float
+
+
+class StartupInfo(BaseModel):
+    #Reporte de arranque del worker que atiende la request
+    steps: list[StartupStep]
+    total_ms: float
+    ready_at: Optional[datetime]
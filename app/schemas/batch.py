@@ -0,0 +1,59 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Optional, Union
+import enum
+from app.core.config import get_settings
+from app.schemas.task import TaskCreate, TaskUpdate, TaskResponse
+
+settings = get_settings()
+
+#Esquemas para el endpoint de batch
+
+
+class BatchMode(str, enum.Enum):
+    #atomic: todo o nada / best_effort: cada operacion en su savepoint
+    ATOMIC = "atomic"
+    BEST_EFFORT = "best_effort"
+
+
+class CreateOperation(BaseModel):
+    op: Literal["create"]
+    data: TaskCreate
+
+
+class UpdateOperation(BaseModel):
+    op: Literal["update"]
+    task_id: int
+    data: TaskUpdate
+
+
+class DeleteOperation(BaseModel):
+    op: Literal["delete"]
+    task_id: int
+
+
+BatchOperation = Annotated[
+    Union[CreateOperation, UpdateOperation, DeleteOperation],
+    Field(discriminator="op")
+]
+
+
+class BatchRequest(BaseModel):
+    mode: BatchMode = Field(default=BatchMode.ATOMIC, description="atomic (all-or-nothing) or best_effort")
+    operations: list[BatchOperation] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.BATCH_MAX_OPERATIONS,
+        description="Ordered task operations"
+    )
+
+
+class BatchOperationResult(BaseModel):
+    index: int
+    status_code: int
+    task: Optional[TaskResponse] = None
+    detail: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: list[BatchOperationResult]
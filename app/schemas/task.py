@@ -1,24 +1,77 @@
-from pydantic import BaseModel, Field
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from datetime import date, datetime
 from typing import Optional
+import enum
+from app.core.config import get_settings
 from app.models.task import TaskStatus
 
+settings = get_settings()
+
 #Esquemas para creacion x
 
+
+class TaskSort(str, enum.Enum):
+    #Ordenamientos permitidos en la lista ("-" = descendente), cada uno con su indice (campo, id)
+    CREATED_AT_ASC = "created_at"
+    CREATED_AT_DESC = "-created_at"
+    UPDATED_AT_ASC = "updated_at"
+    UPDATED_AT_DESC = "-updated_at"
+    TITLE_ASC = "title"
+    TITLE_DESC = "-title"
+    STATUS_ASC = "status"
+    STATUS_DESC = "-status"
+
+
+class TagMatch(str, enum.Enum):
+    #any: al menos uno de los tags / all: todos los tags
+    ANY = "any"
+    ALL = "all"
+
+
+class ActivityBucket(str, enum.Enum):
+    #Granularidad de los rollups de actividad
+    DAY = "day"
+    WEEK = "week"
+
+
+def normalize_tags(tags: Optional[list[str]]) -> Optional[list[str]]:
+    #Minusculas, sin espacios extremos ni duplicados (conserva el orden)
+    if tags is None:
+        return None
+    normalized = list(dict.fromkeys(tag.strip().lower() for tag in tags))
+    if any(not tag or len(tag) > settings.TASK_TAG_MAX_LENGTH for tag in normalized):
+        raise ValueError(f"Tags must have between 1 and {settings.TASK_TAG_MAX_LENGTH} characters")
+    if len(normalized) > settings.TASK_MAX_TAGS:
+        raise ValueError(f"A task can have at most {settings.TASK_MAX_TAGS} tags")
+    return normalized
+
+
 class TaskBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=255, description="Task title")
     description: Optional[str] = Field(None, description="Task description")
     status: TaskStatus = Field(default=TaskStatus.PENDING, description="Task status")
+    tags: list[str] = Field(default_factory=list, description="Task tags (e.g. project, team)")
 
 
 class TaskCreate(TaskBase):
-    pass
+    _normalize_tags = field_validator("tags")(normalize_tags)
 
 
 class TaskUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=255, description="Task title")
     description: Optional[str] = Field(None, description="Task description")
     status: Optional[TaskStatus] = Field(None, description="Task status")
+    tags: Optional[list[str]] = Field(None, description="Replaces the task tags")
+    
+    _normalize_tags = field_validator("tags")(normalize_tags)
+
+    @field_validator("title", "status", "tags", mode="before")
+    @classmethod
+    def reject_null(cls, value):
+        #Omitir el campo lo deja igual; null no es valido en columnas NOT NULL ([] limpia los tags)
+        if value is None:
+            raise ValueError("Cannot be null; omit the field to keep its value")
+        return value
 
 
 class TaskResponse(TaskBase):
@@ -39,3 +92,43 @@ class TaskListResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class TaskBatchGetRequest(BaseModel):
+    ids: list[int] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.BATCH_GET_MAX_IDS,
+        description="Task ids to fetch"
+    )
+
+
+class TaskBatchGetResponse(BaseModel):
+    items: list[TaskResponse]
+    missing: list[int]
+
+
+class TaskTombstoneResponse(BaseModel):
+    id: int = Field(..., validation_alias="task_id")
+    deleted_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class TaskChangesResponse(BaseModel):
+    items: list[TaskResponse]
+    deleted: list[TaskTombstoneResponse]
+    next_token: str
+    has_more: bool
+
+
+class TaskActivityItem(BaseModel):
+    start: date = Field(..., description="First day of the bucket (UTC)")
+    created: int
+    completed: int
+
+
+class TaskActivityResponse(BaseModel):
+    bucket: ActivityBucket
+    items: list[TaskActivityItem]
@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, cast, delete, func, insert, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from fastapi import HTTPException, status
+
+from app.core.config import get_settings
+from app.models.task import Task, TaskArchive, TaskActivity, TaskStatus
+from app.schemas.task import ActivityBucket
+
+settings = get_settings()
+
+
+def _utc_day(column):
+    #Fecha UTC de un timestamptz (no depende del TimeZone de la sesion)
+    return cast(func.timezone("UTC", column), Date)
+
+
+def record_activity(db: Session, owner_id: int, created: int = 0, completed: int = 0) -> None:
+    #Suma al rollup del dia actual dentro de la transaccion del cambio (upsert de una fila)
+    if not created and not completed:
+        return
+    stmt = pg_insert(TaskActivity).values(
+        owner_id=owner_id,
+        day=_utc_day(func.now()),
+        created_count=created,
+        completed_count=completed
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TaskActivity.owner_id, TaskActivity.day],
+        set_={
+            "created_count": TaskActivity.created_count + stmt.excluded.created_count,
+            "completed_count": TaskActivity.completed_count + stmt.excluded.completed_count
+        }
+    )
+    db.execute(stmt)
+
+
+def _bucket_start(day: date, bucket: ActivityBucket) -> date:
+    # Semanas ISO: empiezan en lunes
+    if bucket == ActivityBucket.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def get_activity(
+    db: Session,
+    owner_id: int,
+    start: date,
+    end: date,
+    bucket: ActivityBucket = ActivityBucket.DAY
+) -> list[tuple[date, int, int]]:
+    """
+    Tasks created and completed per bucket between `start` and `end` (inclusive).
+    Reads at most one rollup row per day in the range, whatever the size of tasks.
+    Returns (bucket start, created, completed), with empty buckets as zeros.
+    """
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must be on or before 'to'"
+        )
+    if (end - start).days + 1 > settings.ACTIVITY_MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range cannot exceed {settings.ACTIVITY_MAX_RANGE_DAYS} days"
+        )
+
+    # Con semanas el rango arranca el lunes para no devolver una semana incompleta
+    start = _bucket_start(start, bucket)
+
+    # Range scan sobre la PK (owner_id, day)
+    rows = (
+        db.query(TaskActivity)
+        .filter(TaskActivity.owner_id == owner_id, TaskActivity.day.between(start, end))
+        .all()
+    )
+
+    totals: dict[date, list[int]] = {}
+    for row in rows:
+        counts = totals.setdefault(_bucket_start(row.day, bucket), [0, 0])
+        counts[0] += row.created_count
+        counts[1] += row.completed_count
+
+    step = timedelta(days=7 if bucket == ActivityBucket.WEEK else 1)
+    buckets = []
+    current = start
+    while current <= end:
+        created, completed = totals.get(current, (0, 0))
+        buckets.append((current, created, completed))
+        current += step
+    return buckets
+
+
+def backfill_activity(db: Session) -> int:
+    """
+    Rebuild the rollup from tasks and tasks_archive. Returns how many rows were written.
+    Completion day is approximated by updated_at of done tasks; deleted tasks cannot be recovered.
+    """
+    events = []
+    for table in (Task, TaskArchive):
+        events.append(
+            select(
+                table.owner_id,
+                _utc_day(table.created_at).label("day"),
+                literal(1).label("created"),
+                literal(0).label("completed")
+            )
+        )
+        events.append(
+            select(
+                table.owner_id,
+                _utc_day(table.updated_at).label("day"),
+                literal(0).label("created"),
+                literal(1).label("completed")
+            ).where(table.status == TaskStatus.DONE)
+        )
+    events = union_all(*events).subquery()
+
+    rollup = select(
+        events.c.owner_id,
+        events.c.day,
+        func.sum(events.c.created),
+        func.sum(events.c.completed)
+    ).group_by(events.c.owner_id, events.c.day)
+
+    # Bloquea las escrituras incrementales mientras se reconstruye (las lecturas siguen)
+    db.execute(text("LOCK TABLE task_activity_daily IN EXCLUSIVE MODE"))
+    db.execute(delete(TaskActivity))
+    result = db.execute(
+        insert(TaskActivity).from_select(
+            ["owner_id", "day", "created_count", "completed_count"],
+            rollup
+        )
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,115 @@
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy import Text, bindparam, delete, func, insert, literal, literal_column, select, tuple_
+
+from app.core.config import get_settings
+from app.models.task import Task, TaskArchive, TaskStatus, TaskTombstone
+
+settings = get_settings()
+
+_COLUMNS = ("id", "owner_id", "title", "description", "status", "tags", "created_at", "updated_at")
+
+# Posicion en ix_tasks_done_updated_at_id: (updated_at, id) de la ultima tarea movida
+ArchiveCursor = tuple[datetime, int]
+
+
+def archive_batch(
+    db: Session,
+    older_than_days: int,
+    batch_size: int,
+    after: Optional[ArchiveCursor] = None
+) -> tuple[int, Optional[ArchiveCursor]]:
+    """
+    Move one batch of `done` tasks not modified in `older_than_days` days to
+    tasks_archive, in a single statement. Each moved task also gets a
+    tombstone and a "delete" event: for delta sync and the change feed it
+    left the live set. Candidates are read in (updated_at, id) order from
+    the partial index ix_tasks_done_updated_at_id, starting after `after`.
+    Returns how many rows were moved and the cursor for the next batch.
+    """
+    cutoff = func.now() - timedelta(days=older_than_days)
+
+    # Literal y no parametro: el planner solo usa el indice parcial (WHERE status = 'done')
+    # si puede probar el predicado, tambien con el statement preparado
+    candidates = (
+        select(Task.id)
+        .where(Task.status == literal(TaskStatus.DONE, Task.status.type, literal_execute=True), Task.updated_at < cutoff)
+    )
+    if after is not None:
+        # Keyset: no vuelve a recorrer las entradas de los lotes anteriores (muertas hasta el vacuum)
+        candidates = candidates.where(tuple_(Task.updated_at, Task.id) > tuple_(*after))
+    # SKIP LOCKED: no bloquea ni espera a tareas que se estan editando
+    candidates = (
+        candidates
+        .order_by(Task.updated_at, Task.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+    # DELETE ... RETURNING + INSERT en el archivo + tombstones, todo en el mismo statement (CTEs)
+    moved = (
+        delete(Task)
+        .where(Task.id.in_(candidates.scalar_subquery()))
+        .returning(*[getattr(Task, c) for c in _COLUMNS])
+        .cte("moved")
+    )
+    archived = (
+        insert(TaskArchive)
+        .from_select(list(_COLUMNS), select(*[moved.c[c] for c in _COLUMNS]))
+        .returning(TaskArchive.id)
+        .cte("archived")
+    )
+    tombstoned = (
+        insert(TaskTombstone)
+        .from_select(["task_id", "owner_id"], select(moved.c.id, moved.c.owner_id))
+        .returning(TaskTombstone.task_id, TaskTombstone.owner_id)
+        .cte("tombstoned")
+    )
+    # Mismo payload que publish_task_event; se entrega solo si el lote hace commit
+    # (claves literales: json_build_object no puede inferir el tipo de un parametro)
+    payload = func.json_build_object(
+        literal_column("'op'"), literal_column("'delete'"),
+        literal_column("'id'"), tombstoned.c.task_id,
+        literal_column("'owner_id'"), tombstoned.c.owner_id
+    ).cast(Text)
+    stmt = (
+        select(func.pg_notify(bindparam("channel", settings.TASK_EVENTS_CHANNEL), payload), moved.c.updated_at, moved.c.id)
+        .select_from(tombstoned.join(moved, moved.c.id == tombstoned.c.task_id))
+        # Una CTE que modifica datos se ejecuta siempre, pero hay que emitirla en el WITH
+        .add_cte(archived)
+    )
+
+    rows = db.execute(stmt).all()
+    db.commit()
+    last = max(((row.updated_at, row.id) for row in rows), default=None)
+    return len(rows), last
+
+
+def archive_done_tasks(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    sleep_seconds: float = 0.0,
+    max_batches: Optional[int] = None
+) -> int:
+    #Archiva en lotes (una transaccion corta por lote) hasta que no queden candidatos
+    # Cada lote sigue donde termino el anterior; lo saltado por SKIP LOCKED queda para la proxima corrida
+    older_than_days = older_than_days if older_than_days is not None else settings.ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+
+    total = 0
+    batches = 0
+    cursor = None
+    while max_batches is None or batches < max_batches:
+        moved, cursor = archive_batch(db, older_than_days, batch_size, after=cursor)
+        total += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        # Pausa entre lotes para no saturar la DB
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+    return total
@@ -0,0 +1,87 @@
+import logging
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+from typing import Optional
+
+from app.schemas.batch import (
+    BatchMode, BatchOperationResult, CreateOperation, UpdateOperation, DeleteOperation
+)
+from app.schemas.task import TaskResponse
+from app.services import task_service
+
+logger = logging.getLogger(__name__)
+
+
+def _apply(db: Session, owner_id: int, operation) -> tuple[int, Optional[TaskResponse]]:
+    #Ejecuta una operacion sin commit, reutilizando task_service
+    if isinstance(operation, CreateOperation):
+        task = task_service.create_task(db, owner_id, operation.data, commit=False)
+        return status.HTTP_201_CREATED, TaskResponse.model_validate(task)
+    if isinstance(operation, UpdateOperation):
+        task = task_service.update_task(db, owner_id, operation.task_id, operation.data, commit=False)
+        return status.HTTP_200_OK, TaskResponse.model_validate(task)
+    if isinstance(operation, DeleteOperation):
+        task_service.delete_task(db, owner_id, operation.task_id, commit=False)
+        return status.HTTP_204_NO_CONTENT, None
+    raise ValueError(f"Unknown batch operation: {operation!r}")
+
+
+def _db_error(exc: SQLAlchemyError) -> tuple[int, str]:
+    #Error de DB de una operacion -> (status, detalle) de su resultado, sin abortar el lote
+    if isinstance(exc, IntegrityError):
+        return status.HTTP_409_CONFLICT, "Conflicts with the current state of the data"
+    if isinstance(exc, OperationalError) and type(exc.orig).__name__ == "QueryCanceled":
+        # statement_timeout del deadline de la request
+        return status.HTTP_504_GATEWAY_TIMEOUT, "Request deadline exceeded"
+    logger.exception("Batch operation failed with a database error")
+    return status.HTTP_500_INTERNAL_SERVER_ERROR, "Database error"
+
+
+def run_batch(db: Session, owner_id: int, operations: list, mode: BatchMode) -> tuple[bool, list[BatchOperationResult]]:
+    """
+    Run the operations in order inside one DB transaction.
+    atomic: the first failure rolls everything back (earlier results become 424).
+    best_effort: each operation runs in a SAVEPOINT; failures only undo that operation.
+    HTTP and DB errors (integrity, statement timeout...) both end as that
+    operation's result instead of failing the whole request.
+    Returns (committed, per-operation results).
+    """
+    results: list[BatchOperationResult] = []
+
+    for index, operation in enumerate(operations):
+        try:
+            if mode == BatchMode.BEST_EFFORT:
+                with db.begin_nested():
+                    status_code, task = _apply(db, owner_id, operation)
+            else:
+                status_code, task = _apply(db, owner_id, operation)
+        except (HTTPException, SQLAlchemyError) as exc:
+            if isinstance(exc, HTTPException):
+                error_status, detail = exc.status_code, exc.detail
+            else:
+                error_status, detail = _db_error(exc)
+            results.append(BatchOperationResult(index=index, status_code=error_status, detail=detail))
+            if mode == BatchMode.ATOMIC:
+                db.rollback()
+                # Las anteriores ya no estan aplicadas: su resultado no puede quedar en 200/201/204
+                for done in results[:index]:
+                    done.status_code = status.HTTP_424_FAILED_DEPENDENCY
+                    done.task = None
+                    done.detail = f"Rolled back: operation {index} failed"
+                # Las operaciones restantes no se ejecutan
+                results.extend(
+                    BatchOperationResult(
+                        index=pending,
+                        status_code=status.HTTP_424_FAILED_DEPENDENCY,
+                        detail=f"Not executed: operation {index} failed"
+                    )
+                    for pending in range(index + 1, len(operations))
+                )
+                return False, results
+            continue
+
+        results.append(BatchOperationResult(index=index, status_code=status_code, task=task))
+
+    db.commit()
+    return True, results
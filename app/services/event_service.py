@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Evento que recibe un suscriptor lento antes de ser desconectado
+DROPPED = object()
+
+
+def publish_task_event(db: Session, op: str, task_id: int, owner_id: int) -> None:
+    #Publica el cambio con pg_notify; Postgres lo entrega solo si la transaccion hace commit
+    payload = json.dumps({"op": op, "id": task_id, "owner_id": owner_id}, separators=(",", ":"))
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": settings.TASK_EVENTS_CHANNEL, "payload": payload}
+    )
+
+
+class Subscriber:
+    #Cola acotada por cliente, vive en el event loop del request
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int, owner_id: int):
+        self.loop = loop
+        self.owner_id = owner_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def offer(self, payload: str) -> None:
+        # Se ejecuta dentro del loop (call_soon_threadsafe)
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Cliente lento: se descarta lo pendiente y se le avisa que se desconecta
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(DROPPED)
+
+
+class TaskEventBroadcaster:
+    """
+    One shared LISTEN connection per worker process, fanned out to all
+    SSE subscribers. The listener thread starts with the first subscriber.
+    """
+
+    def __init__(self, channel: str, queue_size: int, reconnect_delay: float = 1.0):
+        self.channel = channel
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, owner_id: int) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), self.queue_size, owner_id)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._listen, name="task-events-listener", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _dispatch(self, payload: str) -> None:
+        # Cada cliente solo recibe eventos de sus tareas (resync va a todos)
+        owner_id = json.loads(payload).get("owner_id")
+        with self._lock:
+            subscribers = [
+                subscriber for subscriber in self._subscribers
+                if owner_id is None or subscriber.owner_id == owner_id
+            ]
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, payload)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerro
+                self.unsubscribe(subscriber)
+
+    def _listen(self) -> None:
+        # Solo el thread del LISTEN usa psycopg directo: no se carga al importar la app
+        import psycopg
+
+        conninfo = psycopg.conninfo.make_conninfo(
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            dbname=settings.DB_NAME,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD
+        )
+        reconnected = False
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.add_notify_handler(lambda notify: self._dispatch(notify.payload))
+                    conn.execute(f'LISTEN "{self.channel}"')
+                    if reconnected:
+                        # Pudieron perderse eventos mientras no habia conexion
+                        self._dispatch(json.dumps({"op": "resync"}))
+                    while not self._stop.is_set():
+                        # Espera con timeout para poder revisar _stop
+                        readable, _, _ = select.select([conn.fileno()], [], [], 1.0)
+                        if readable:
+                            # Leer del socket entrega las notificaciones al handler
+                            conn.execute("SELECT 1")
+            except psycopg.Error:
+                logger.exception("Task events listener lost its connection, reconnecting")
+                reconnected = True
+                self._stop.wait(self.reconnect_delay)
+
+
+task_event_broadcaster = TaskEventBroadcaster(
+    channel=settings.TASK_EVENTS_CHANNEL,
+    queue_size=settings.TASK_STREAM_QUEUE_SIZE
+)
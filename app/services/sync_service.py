@@ -0,0 +1,131 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, tuple_
+from fastapi import HTTPException, status
+
+from app.core.config import get_settings
+from app.models.task import Task, TaskTombstone
+
+settings = get_settings()
+
+# Cursor por stream: (timestamp, ultimo id). id None == todo ese timestamp ya se entrego
+Cursor = tuple[datetime, Optional[int]]
+
+
+def encode_sync_token(tasks_cursor: Optional[Cursor], deleted_cursor: Cursor) -> str:
+    #Token opaco (base64url de JSON) con la posicion de cada stream
+    def _dump(cursor: Optional[Cursor]):
+        if cursor is None:
+            return None
+        return [cursor[0].isoformat(), cursor[1]]
+
+    raw = json.dumps({"u": _dump(tasks_cursor), "d": _dump(deleted_cursor)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_sync_token(token: str) -> tuple[Optional[Cursor], Cursor]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+
+        def _load(value) -> Cursor:
+            ts, last_id = value
+            ts = datetime.fromisoformat(ts)
+            if ts.tzinfo is None:
+                # Los tokens propios siempre llevan zona; uno naive no se puede comparar con now()
+                raise ValueError("naive timestamp")
+            return ts, (int(last_id) if last_id is not None else None)
+
+        tasks_cursor = _load(data["u"]) if data["u"] is not None else None
+        return tasks_cursor, _load(data["d"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token"
+        )
+
+
+def _after(ts_column, id_column, cursor: Cursor):
+    #Condicion keyset (ts, id) > cursor
+    ts, last_id = cursor
+    if last_id is None:
+        return ts_column > ts
+    return tuple_(ts_column, id_column) > tuple_(ts, last_id)
+
+
+def get_changes(
+    db: Session,
+    owner_id: int,
+    token: Optional[str] = None,
+    limit: int = 500
+) -> tuple[list[Task], list[TaskTombstone], str, bool]:
+    """
+    Tasks changed and tasks deleted since `token`, plus the next sync token.
+    Without token returns a full snapshot (paged) and starts tracking deletes from now.
+    """
+    # Solo se entregan cambios anteriores a now() - lag, asi no se pierden transacciones que aun
+    # no hacen commit con un updated_at anterior (el lag cubre el mayor deadline, ver config)
+    now = db.scalar(select(func.now()))
+    upper = now - timedelta(seconds=settings.SYNC_SAFETY_LAG_SECONDS)
+
+    if token:
+        tasks_cursor, deleted_cursor = decode_sync_token(token)
+        horizon = now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        if deleted_cursor[0] < horizon:
+            # Los tombstones ya se purgaron: el cliente debe resincronizar completo
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Sync token expired, a full resync is required"
+            )
+    else:
+        tasks_cursor, deleted_cursor = None, (upper, None)
+
+    # Tareas creadas/actualizadas, por el indice (owner_id, updated_at, id)
+    query = db.query(Task).filter(Task.owner_id == owner_id, Task.updated_at <= upper)
+    if tasks_cursor is not None:
+        query = query.filter(_after(Task.updated_at, Task.id, tasks_cursor))
+    tasks = query.order_by(Task.updated_at, Task.id).limit(limit + 1).all()
+
+    # Tareas eliminadas
+    tombstones = (
+        db.query(TaskTombstone)
+        .filter(TaskTombstone.owner_id == owner_id, TaskTombstone.deleted_at <= upper)
+        .filter(_after(TaskTombstone.deleted_at, TaskTombstone.task_id, deleted_cursor))
+        .order_by(TaskTombstone.deleted_at, TaskTombstone.task_id)
+        .limit(limit + 1)
+        .all()
+    )
+
+    tasks_more = len(tasks) > limit
+    tombstones_more = len(tombstones) > limit
+    tasks = tasks[:limit]
+    tombstones = tombstones[:limit]
+
+    # Si el stream se completo avanza hasta upper; si no, queda en la ultima fila
+    if tasks_more:
+        next_tasks_cursor = (tasks[-1].updated_at, tasks[-1].id)
+    else:
+        next_tasks_cursor = (upper, None)
+    if tombstones_more:
+        next_deleted_cursor = (tombstones[-1].deleted_at, tombstones[-1].task_id)
+    else:
+        next_deleted_cursor = (upper, None)
+
+    next_token = encode_sync_token(next_tasks_cursor, next_deleted_cursor)
+    return tasks, tombstones, next_token, tasks_more or tombstones_more
+
+
+def purge_tombstones(db: Session) -> int:
+    #Elimina tombstones fuera de la retencion, devuelve cuantos se borraron
+    horizon = func.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted = (
+        db.query(TaskTombstone)
+        .filter(TaskTombstone.deleted_at < horizon)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
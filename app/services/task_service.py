@@ -1,13 +1,21 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from functools import lru_cache
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, select, union_all, update, any_, bindparam, Integer, Text
+from sqlalchemy.dialects.postgresql import ARRAY
 from fastapi import HTTPException, status
 from typing import Optional
-from app.models.task import Task, TaskStatus
-from app.schemas.task import TaskCreate, TaskUpdate
+from app.core.tracing import traced
+from app.db.statements import task_by_id
+from app.models.task import Task, TaskStatus, TaskTombstone, TaskArchive
+from app.schemas.task import TaskCreate, TaskUpdate, TaskSort, TagMatch, normalize_tags
+from app.services.event_service import publish_task_event
+from app.services.activity_service import record_activity
 
 
-def get_task(db: Session, task_id: int) -> Task:
-    task = db.query(Task).filter(Task.id == task_id).first()
+@traced()
+def get_task(db: Session, owner_id: int, task_id: int) -> Task:
+    #Tareas de otro usuario responden 404 igual que las inexistentes
+    task = db.scalars(task_by_id, {"task_id": task_id, "owner_id": owner_id}).first()
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -15,46 +23,202 @@ def get_task(db: Session, task_id: int) -> Task:
         )
     return task
 
+
+@traced()
+def get_tasks_by_ids(db: Session, owner_id: int, task_ids: list[int]) -> tuple[list[Task], list[int]]:
+    #Varias tareas en una sola query (id = ANY(:ids), un unico plan para cualquier cantidad)
+    #Regresa las encontradas en el orden pedido y los ids que no existen
+    unique_ids = list(dict.fromkeys(task_ids))
+    found = {
+        task.id: task
+        for task in db.query(Task).filter(
+            Task.id == any_(bindparam("task_ids", unique_ids, type_=ARRAY(Integer))),
+            Task.owner_id == owner_id
+        )
+    }
+    tasks = [found[task_id] for task_id in unique_ids if task_id in found]
+    missing = [task_id for task_id in unique_ids if task_id not in found]
+    return tasks, missing
+
+
+def _order_by(entity, sort: TaskSort) -> list:
+    #Campo + id como desempate, misma direccion en ambos para recorrer el indice (campo, id)
+    field = sort.value.lstrip("-")
+    columns = [getattr(entity, field), entity.id]
+    if sort.value.startswith("-"):
+        return [column.desc() for column in columns]
+    return [column.asc() for column in columns]
+
+
+def _tags_condition(entity, tags: list[str], tag_match: TagMatch):
+    #&& (overlap) para any, @> (contains) para all; ambos usan el indice GIN (owner_id, tags)
+    if tag_match == TagMatch.ALL:
+        return entity.tags.contains(tags)
+    return entity.tags.overlap(tags)
+
+
+@lru_cache(maxsize=None)
+def list_statements(sort: TaskSort, has_status: bool, tag_match: Optional[TagMatch]):
+    """
+    (count, page) statements of the list for one combination of filters and
+    sort, built once with bindparams and reused (tag_match None = no tags).
+    Values: owner_id, status_filter, tags, skip, limit.
+    """
+    conditions = [Task.owner_id == bindparam("owner_id")]
+    if has_status:
+        conditions.append(Task.status == bindparam("status_filter"))
+    if tag_match is not None:
+        conditions.append(_tags_condition(Task, bindparam("tags", type_=ARRAY(Text)), tag_match))
+    
+    # count(*) directo sobre tasks: sin subquery, puede resolverse con un index-only scan
+    count = select(func.count()).select_from(Task).where(*conditions)
+    page = (
+        select(Task)
+        .where(*conditions)
+        .order_by(*_order_by(Task, sort))
+        .offset(bindparam("skip", type_=Integer))
+        .limit(bindparam("limit", type_=Integer))
+    )
+    return count, page
+
+
 #Paginada
+@traced()
 def get_tasks(
     db: Session,
+    owner_id: int,
     skip: int = 0,
     limit: int = 10,
-    status_filter: Optional[TaskStatus] = None
+    status_filter: Optional[TaskStatus] = None,
+    include_archived: bool = False,
+    sort: TaskSort = TaskSort.CREATED_AT_DESC,
+    tags: Optional[list[str]] = None,
+    tag_match: TagMatch = TagMatch.ANY
 ) -> tuple[list[Task], int]:
-    #Filtrado opcional por status
+    #Filtrado opcional por status y tags
     #Regresa lista con las tareas y cuantas hay
-    query = db.query(Task)
+    try:
+        tags = normalize_tags(tags)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc)
+        )
     
-    #Filtro
-    if status_filter:
-        query = query.filter(Task.status == status_filter)
+    # El archivo solo tiene tareas done: con otro filtro no hace falta consultarlo
+    if include_archived and status_filter in (None, TaskStatus.DONE):
+        return _get_tasks_with_archive(db, owner_id, skip, limit, status_filter, sort, tags, tag_match)
+    
+    count, page = list_statements(sort, status_filter is not None, tag_match if tags else None)
+    params = {"owner_id": owner_id, "status_filter": status_filter, "tags": tags, "skip": skip, "limit": limit}
     
     # Obtener total
-    total = query.count()
+    total = db.scalar(count, params)
+    
+    # Resultados paginados y ordenados (default: fecha de creacion desc)
+    tasks = db.scalars(page, params).all()
+    
+    return tasks, total
+
+
+def _get_tasks_with_archive(
+    db: Session,
+    owner_id: int,
+    skip: int,
+    limit: int,
+    status_filter: Optional[TaskStatus],
+    sort: TaskSort,
+    tags: Optional[list[str]],
+    tag_match: TagMatch
+) -> tuple[list[Task], int]:
+    #UNION ALL de tasks y tasks_archive, mapeado de vuelta a Task
+    columns = ("id", "title", "description", "status", "tags", "created_at", "updated_at")
+    live = select(*[getattr(Task, c) for c in columns]).where(Task.owner_id == owner_id)
+    archived = select(*[getattr(TaskArchive, c) for c in columns]).where(TaskArchive.owner_id == owner_id)
+    if status_filter:
+        live = live.where(Task.status == status_filter)
+        archived = archived.where(TaskArchive.status == status_filter)
+    if tags:
+        live = live.where(_tags_condition(Task, tags, tag_match))
+        archived = archived.where(_tags_condition(TaskArchive, tags, tag_match))
     
-    # Resultados paginados y ordenados por fecha de creacion
-    tasks = query.order_by(Task.created_at.desc()).offset(skip).limit(limit).all()
+    # Cada total sale de su propio indice
+    total = (
+        db.scalar(select(func.count()).select_from(live.subquery()))
+        + db.scalar(select(func.count()).select_from(archived.subquery()))
+    )
+    
+    combined = aliased(Task, union_all(live, archived).subquery("combined"))
+    tasks = (
+        db.query(combined)
+        .order_by(*_order_by(combined, sort))
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     
     return tasks, total
 
 
-def create_task(db: Session, task: TaskCreate) -> Task:
+@traced()
+def create_task(db: Session, owner_id: int, task: TaskCreate, commit: bool = True) -> Task:
+    #commit=False deja el cambio en la transaccion actual (batch)
     db_task = Task(
+        owner_id=owner_id,
         title=task.title,
         description=task.description,
-        status=task.status
+        status=task.status,
+        tags=task.tags
     )
     
     db.add(db_task)
-    db.commit()
+    db.flush()
+    record_activity(db, owner_id, created=1, completed=int(task.status == TaskStatus.DONE))
+    publish_task_event(db, "create", db_task.id, owner_id)
+    if commit:
+        db.commit()
     db.refresh(db_task)
     
     return db_task
 
 
-def update_task(db: Session, task_id: int, task_update: TaskUpdate) -> Task:
-    db_task = get_task(db, task_id)
+@traced()
+def claim_tasks(db: Session, owner_id: int, n: int) -> list[Task]:
+    """
+    Atomically move up to `n` oldest pending tasks to in_progress and return them.
+    SKIP LOCKED lets concurrent workers claim disjoint rows without waiting.
+    """
+    # Recorre ix_tasks_owner_status_created_at_id (owner, status = pending, por created_at)
+    candidates = (
+        select(Task.id)
+        .where(Task.owner_id == owner_id, Task.status == TaskStatus.PENDING)
+        .order_by(Task.created_at)
+        .limit(n)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(Task)
+        .where(Task.id.in_(candidates.scalar_subquery()))
+        .values(status=TaskStatus.IN_PROCES)
+        .returning(Task)
+        .execution_options(synchronize_session=False)
+    )
+    tasks = db.scalars(stmt).all()
+    
+    # RETURNING no garantiza orden; se ordena con los valores ya cargados
+    tasks = sorted(tasks, key=lambda task: (task.created_at, task.id))
+    for task in tasks:
+        publish_task_event(db, "update", task.id, owner_id)
+        # Fuera de la sesion antes del commit: no se expiran y serializarlas no hace un SELECT por tarea
+        db.expunge(task)
+    db.commit()
+    
+    return tasks
+
+
+@traced()
+def update_task(db: Session, owner_id: int, task_id: int, task_update: TaskUpdate, commit: bool = True) -> Task:
+    db_task = get_task(db, owner_id, task_id)
     
     #Actualiza campos proporcionados    (solo los proporcionados)
                                                 #|
@@ -66,17 +230,32 @@ def update_task(db: Session, task_id: int, task_update: TaskUpdate) -> Task:
             detail="No fields provided for update"
         )
     
+    # Solo la transicion a done cuenta como completada
+    completed = update_data.get("status") == TaskStatus.DONE and db_task.status != TaskStatus.DONE
+    
     for field, value in update_data.items():
         setattr(db_task, field, value)
     
-    db.commit()
+    record_activity(db, owner_id, completed=int(completed))
+    publish_task_event(db, "update", task_id, owner_id)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     db.refresh(db_task)
     
     return db_task
 
 
-def delete_task(db: Session, task_id: int) -> None:
-    db_task = get_task(db, task_id)
+@traced()
+def delete_task(db: Session, owner_id: int, task_id: int, commit: bool = True) -> None:
+    db_task = get_task(db, owner_id, task_id)
     
+    # Tombstone en la misma transaccion para que el delta sync vea el borrado
     db.delete(db_task)
-    db.commit()
+    db.add(TaskTombstone(task_id=task_id, owner_id=owner_id))
+    publish_task_event(db, "delete", task_id, owner_id)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
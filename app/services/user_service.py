@@ -1,13 +1,17 @@
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
 from fastapi import HTTPException, status
-from app.models.user import User
+from app.models.user import User, RevokedToken
 from app.schemas.user import UserCreate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, verify_password, password_needs_rehash
+from app.core.revocation import revocation_list
+from app.db.statements import user_by_email
 
 
 def get_user_by_email(db: Session, email: str) -> User | None:
     #Obtener email
-    return db.query(User).filter(User.email == email).first()
+    return db.scalars(user_by_email, {"email": email}).first()
 
 
 def create_user(db: Session, user: UserCreate) -> User:
@@ -40,4 +44,29 @@ def authenticate_user(db: Session, email: str, password: str) -> User | None:
         return None
     if not verify_password(password, user.hashed_password):
         return None
+    
+    # Unico momento con la contraseña en claro: se migra al costo actual sin reset
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = get_password_hash(password)
+        db.commit()
     return user
+
+
+def revoke_token(db: Session, user_id: int, payload: dict) -> None:
+    """Revoke a token until its exp: stored for the other workers, applied here right away."""
+    jti = payload.get("jti")
+    if jti is None:
+        # Tokens emitidos antes de agregar jti: no se pueden revocar individualmente
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Token cannot be revoked, request a new one"
+        )
+    
+    expires_at = datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
+    db.execute(
+        insert(RevokedToken)
+        .values(jti=jti, user_id=user_id, expires_at=expires_at)
+        .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+    )
+    db.commit()
+    revocation_list.add(jti, payload["exp"])
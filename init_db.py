@@ -95,18 +95,92 @@ def create_tables_via_docker():
             updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
         );
         
-        CREATE INDEX IF NOT EXISTS ix_tasks_id ON tasks(id);
-        CREATE INDEX IF NOT EXISTS ix_tasks_status ON tasks(status);
-        CREATE INDEX IF NOT EXISTS ix_tasks_created_at ON tasks(created_at);
-        CREATE INDEX IF NOT EXISTS ix_tasks_status_created_at ON tasks(status, created_at);
+        ALTER TABLE tasks ADD COLUMN IF NOT EXISTS tags TEXT[] DEFAULT '{}' NOT NULL;
+        ALTER TABLE tasks ADD COLUMN IF NOT EXISTS owner_id INTEGER CONSTRAINT fk_tasks_owner_id_users REFERENCES users(id) ON DELETE CASCADE;
+        UPDATE tasks SET owner_id = (SELECT min(id) FROM users) WHERE owner_id IS NULL;
+        ALTER TABLE tasks ALTER COLUMN owner_id SET NOT NULL;
+        
+        CREATE INDEX IF NOT EXISTS ix_tasks_owner_created_at_id ON tasks(owner_id, created_at, id);
+        CREATE INDEX IF NOT EXISTS ix_tasks_owner_updated_at_id ON tasks(owner_id, updated_at, id);
+        CREATE INDEX IF NOT EXISTS ix_tasks_owner_title_id ON tasks(owner_id, title, id);
+        CREATE INDEX IF NOT EXISTS ix_tasks_owner_status_id ON tasks(owner_id, status, id);
+        CREATE INDEX IF NOT EXISTS ix_tasks_owner_status_created_at_id ON tasks(owner_id, status, created_at, id);
+        CREATE INDEX IF NOT EXISTS ix_tasks_owner_status_updated_at_id ON tasks(owner_id, status, updated_at, id);
+        CREATE INDEX IF NOT EXISTS ix_tasks_owner_status_title_id ON tasks(owner_id, status, title, id);
+        CREATE EXTENSION IF NOT EXISTS btree_gin;
+        CREATE INDEX IF NOT EXISTS ix_tasks_owner_tags ON tasks USING GIN (owner_id, tags);
+        CREATE INDEX IF NOT EXISTS ix_tasks_done_updated_at_id ON tasks(updated_at, id) WHERE status = 'done';
+        DROP INDEX IF EXISTS ix_tasks_created_at;
+        DROP INDEX IF EXISTS ix_tasks_status;
+        DROP INDEX IF EXISTS ix_tasks_status_created_at;
+        DROP INDEX IF EXISTS ix_tasks_created_at_id;
+        DROP INDEX IF EXISTS ix_tasks_updated_at_id;
+        DROP INDEX IF EXISTS ix_tasks_title_id;
+        DROP INDEX IF EXISTS ix_tasks_status_id;
+        DROP INDEX IF EXISTS ix_tasks_id;
+        DROP INDEX IF EXISTS ix_tasks_owner_status_created_at;
+        DROP INDEX IF EXISTS ix_tasks_tags;
+        
+        -- Tabla task_tombstones (delta sync)
+        CREATE TABLE IF NOT EXISTS task_tombstones (
+            task_id INTEGER PRIMARY KEY,
+            deleted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
+        );
+        
+        ALTER TABLE task_tombstones ADD COLUMN IF NOT EXISTS owner_id INTEGER CONSTRAINT fk_task_tombstones_owner_id_users REFERENCES users(id) ON DELETE CASCADE;
+        UPDATE task_tombstones SET owner_id = (SELECT min(id) FROM users) WHERE owner_id IS NULL;
+        ALTER TABLE task_tombstones ALTER COLUMN owner_id SET NOT NULL;
+        
+        CREATE INDEX IF NOT EXISTS ix_task_tombstones_owner_deleted_at_task_id ON task_tombstones(owner_id, deleted_at, task_id);
+        DROP INDEX IF EXISTS ix_task_tombstones_deleted_at_task_id;
+        
+        -- Tabla tasks_archive (tareas done antiguas)
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            status taskstatus NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            archived_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
+        );
+        
+        ALTER TABLE tasks_archive ADD COLUMN IF NOT EXISTS tags TEXT[] DEFAULT '{}' NOT NULL;
+        ALTER TABLE tasks_archive ADD COLUMN IF NOT EXISTS owner_id INTEGER CONSTRAINT fk_tasks_archive_owner_id_users REFERENCES users(id) ON DELETE CASCADE;
+        UPDATE tasks_archive SET owner_id = (SELECT min(id) FROM users) WHERE owner_id IS NULL;
+        ALTER TABLE tasks_archive ALTER COLUMN owner_id SET NOT NULL;
+        
+        CREATE INDEX IF NOT EXISTS ix_tasks_archive_owner_status_created_at ON tasks_archive(owner_id, status, created_at);
+        DROP INDEX IF EXISTS ix_tasks_archive_status_created_at;
+        
+        -- Tabla task_activity_daily (rollup de actividad por dia)
+        CREATE TABLE IF NOT EXISTS task_activity_daily (
+            owner_id INTEGER NOT NULL CONSTRAINT fk_task_activity_daily_owner_id_users REFERENCES users(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            created_count INTEGER DEFAULT 0 NOT NULL,
+            completed_count INTEGER DEFAULT 0 NOT NULL,
+            PRIMARY KEY (owner_id, day)
+        );
+        
+        -- Tabla revoked_tokens (logout de JWT)
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti VARCHAR(64) PRIMARY KEY,
+            user_id INTEGER NOT NULL CONSTRAINT fk_revoked_tokens_user_id_users REFERENCES users(id) ON DELETE CASCADE,
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            revoked_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
+        );
+        
+        CREATE INDEX IF NOT EXISTS ix_revoked_tokens_revoked_at ON revoked_tokens(revoked_at);
+        CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at ON revoked_tokens(expires_at);
         
         -- Tabla alembic_version (para compatibilidad)
         CREATE TABLE IF NOT EXISTS alembic_version (
             version_num VARCHAR(32) PRIMARY KEY
         );
         
-        INSERT INTO alembic_version VALUES ('002_seed_data') 
-        ON CONFLICT DO NOTHING;
+        -- Marca el esquema en la ultima migracion (una sola fila)
+        DELETE FROM alembic_version;
+        INSERT INTO alembic_version VALUES ('013_archive_candidates_index');
         """
         
         # Ejecutar SQL
@@ -162,8 +236,10 @@ def seed_initial_data():
             SELECT COUNT(*) INTO task_count FROM tasks;
             
             IF task_count = 0 THEN
-                -- Insertar tareas de ejemplo
-                INSERT INTO tasks (title, description, status) VALUES
+                -- Insertar tareas de ejemplo (del usuario inicial)
+                INSERT INTO tasks (title, description, status, owner_id)
+                SELECT v.title, v.description, v.status::taskstatus, u.id
+                FROM users u CROSS JOIN (VALUES
                 ('Complete project documentation', 'Write comprehensive README and API documentation', 'in_progress'),
                 ('Implement user authentication', 'Set up JWT authentication with secure password hashing', 'done'),
                 ('Add pagination to task list', 'Implement cursor-based pagination for better performance', 'done'),
@@ -173,7 +249,18 @@ def seed_initial_data():
                 ('Implement rate limiting', 'Add rate limiting middleware to prevent abuse', 'pending'),
                 ('Add logging and monitoring', 'Set up structured logging and application monitoring', 'pending'),
                 ('Create Docker deployment', 'Containerize application for easy deployment', 'pending'),
-                ('Review code quality', 'Perform code review and refactoring where necessary', 'pending');
+                ('Review code quality', 'Perform code review and refactoring where necessary', 'pending')
+                ) AS v(title, description, status)
+                WHERE u.email = '{settings.INITIAL_USER_EMAIL}';
+                
+                -- Rollup de actividad de las tareas de ejemplo
+                INSERT INTO task_activity_daily (owner_id, day, created_count, completed_count)
+                SELECT owner_id, (created_at AT TIME ZONE 'UTC')::date, count(*), count(*) FILTER (WHERE status = 'done')
+                FROM tasks
+                GROUP BY 1, 2
+                ON CONFLICT (owner_id, day) DO UPDATE SET
+                    created_count = task_activity_daily.created_count + EXCLUDED.created_count,
+                    completed_count = task_activity_daily.completed_count + EXCLUDED.completed_count;
                 
                 RAISE NOTICE 'Tareas creadas';
             ELSE
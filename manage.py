@@ -0,0 +1,660 @@
+"""
+Management commands for maintenance jobs.
+
+Usage:
+    python manage.py purge-tombstones
+    python manage.py archive-tasks [--days N] [--batch-size N] [--sleep S] [--max-batches N]
+    python manage.py check-sort-plans [--owner-email EMAIL] [--owner-id N]
+    python manage.py check-statement-timeout [--pause S]
+    python manage.py seed-plan-data [--tasks N] [--users N] [--hot-share F] [--seed N] [--drop]
+    python manage.py check-plans [--owner-email EMAIL] [--baseline PATH] [--update-baseline] [--buffer-tolerance F] [--seq-scan-rows N]
+    python manage.py backfill-activity
+    python manage.py bench-compression [--items N] [--rounds N]
+    python manage.py bench-queries [--email EMAIL] [--iterations N] [--warmup N]
+    python manage.py bench-import [--module NAME] [--runs N] [--budget-ms MS] [--top N]
+    python manage.py calibrate-bcrypt [--target-ms MS] [--min-rounds N] [--max-rounds N] [--env-file PATH] [--dry-run]
+"""
+import argparse
+import json
+import sys
+
+from app.db.session import SessionLocal, get_engine
+
+
+def purge_tombstones(args: argparse.Namespace) -> None:
+    """Delete delta-sync tombstones older than the retention window."""
+    from app.services.sync_service import purge_tombstones as _purge
+
+    with SessionLocal() as db:
+        deleted = _purge(db)
+    print(f"✅ {deleted} tombstones eliminados")
+
+
+def archive_tasks(args: argparse.Namespace) -> None:
+    """Move old done tasks to tasks_archive in batches."""
+    from app.services.archive_service import archive_done_tasks
+
+    with SessionLocal() as db:
+        moved = archive_done_tasks(
+            db,
+            older_than_days=args.days,
+            batch_size=args.batch_size,
+            sleep_seconds=args.sleep,
+            max_batches=args.max_batches
+        )
+    print(f"✅ {moved} tareas archivadas")
+
+
+def backfill_activity(args: argparse.Namespace) -> None:
+    """Rebuild the daily activity rollup from tasks and tasks_archive."""
+    from app.services.activity_service import backfill_activity as _backfill
+
+    with SessionLocal() as db:
+        rows = _backfill(db)
+    print(f"✅ {rows} días de actividad recalculados")
+
+
+def bench_compression(args: argparse.Namespace) -> None:
+    """CPU cost vs bytes saved of each encoder on a synthetic task list page."""
+    import time
+    from datetime import datetime, timezone
+    from app.core.compression import Encoder, brotli
+
+    now = datetime.now(timezone.utc).isoformat()
+    items = [
+        {
+            "id": i,
+            "title": f"Task {i}: review pull request #{i * 7}",
+            "description": f"Check the changes of iteration {i}, run the suite and leave comments for the team.",
+            "status": ("pending", "in_progress", "done")[i % 3],
+            "tags": ["backend", f"sprint-{i % 12}"],
+            "created_at": now,
+            "updated_at": now
+        }
+        for i in range(args.items)
+    ]
+    body = json.dumps({"items": items, "total": args.items, "page": 1, "page_size": args.items, "total_pages": 1}).encode("utf-8")
+
+    configs = [("gzip", level, 0) for level in (1, 6, 9)]
+    if brotli is not None:
+        configs += [("br", 6, quality) for quality in (1, 4, 6, 11)]
+    else:
+        print("⚠️  brotli no está instalado, solo se mide gzip")
+
+    print(f"Payload: {len(body)} bytes ({args.items} tareas), {args.rounds} rondas\n")
+    print(f"{'encoder':<10}{'bytes':>10}{'ratio':>8}{'ms/resp':>10}{'MB/s':>9}{'µs CPU/KB ahorrado':>21}")
+    for encoding, gzip_level, brotli_quality in configs:
+        start = time.process_time()
+        for _ in range(args.rounds):
+            compressed = Encoder(encoding, gzip_level, brotli_quality).compress(body, final=True)
+        cpu = (time.process_time() - start) / args.rounds
+        saved_kb = (len(body) - len(compressed)) / 1024
+        name = f"{encoding}-{gzip_level if encoding == 'gzip' else brotli_quality}"
+        print(
+            f"{name:<10}{len(compressed):>10}{len(body) / len(compressed):>8.1f}"
+            f"{cpu * 1000:>10.3f}{len(body) / cpu / 1e6 if cpu else float('inf'):>9.1f}"
+            f"{cpu * 1e6 / saved_kb if saved_kb > 0 else float('inf'):>21.1f}"
+        )
+
+
+def bench_queries(args: argparse.Namespace) -> None:
+    """
+    Cost per call of the hot queries: the previous ORM Query code vs the
+    cached statements, with and without psycopg prepared statements, plus
+    the Postgres planning time that a prepared statement stops paying.
+    """
+    import time
+    from sqlalchemy import create_engine, select, text
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.orm import Session
+    from app.core.config import get_settings
+    from app.db.statements import task_by_id, user_by_email
+    from app.models.task import Task
+    from app.models.user import User
+    from app.schemas.task import TaskSort
+    from app.services.task_service import list_statements
+
+    settings = get_settings()
+    email = args.email or settings.INITIAL_USER_EMAIL
+    count, page = list_statements(TaskSort.CREATED_AT_DESC, False, None)
+
+    def orm_calls(db: Session, owner_id: int, task_id: int) -> dict:
+        # Como estaba antes: Query nueva (y su cache key) en cada llamada
+        def list_and_count():
+            query = db.query(Task).filter(Task.owner_id == owner_id).order_by(Task.created_at.desc(), Task.id.desc())
+            return query.order_by(None).count(), query.offset(0).limit(10).all()
+        return {
+            "user_by_email": lambda: db.query(User).filter(User.email == email).first(),
+            "task_by_id": lambda: db.query(Task).filter(Task.id == task_id, Task.owner_id == owner_id).first(),
+            "list + count": list_and_count,
+        }
+
+    def cached_calls(db: Session, owner_id: int, task_id: int) -> dict:
+        params = {"owner_id": owner_id, "skip": 0, "limit": 10}
+        return {
+            "user_by_email": lambda: db.scalars(user_by_email, {"email": email}).first(),
+            "task_by_id": lambda: db.scalars(task_by_id, {"task_id": task_id, "owner_id": owner_id}).first(),
+            "list + count": lambda: (db.scalar(count, params), db.scalars(page, params).all()),
+        }
+
+    # (nombre, prepare_threshold, llamadas); threshold 0 = preparar desde la primera ejecucion
+    variants = [
+        ("ORM Query", None, orm_calls),
+        ("cached", None, cached_calls),
+        ("cached + prepared", 0, cached_calls),
+    ]
+
+    print(f"{args.iterations} llamadas por query (+{args.warmup} de calentamiento), usuario {email}\n")
+    print(f"{'query':<16}{'variante':<20}{'µs CPU Python':>15}{'µs total':>11}{'µs Postgres+red':>17}")
+    planning: dict[str, float] = {}
+    for name, threshold, make_calls in variants:
+        engine = create_engine(settings.DATABASE_URL, pool_size=1, connect_args={"prepare_threshold": threshold})
+        with Session(engine) as db:
+            owner = db.scalars(select(User).where(User.email == email)).first()
+            if owner is None:
+                print(f"❌ No existe el usuario {email}")
+                sys.exit(1)
+            task_id = db.scalar(select(Task.id).where(Task.owner_id == owner.id).limit(1))
+            if task_id is None:
+                print(f"❌ {email} no tiene tareas (ver seed-plan-data)")
+                sys.exit(1)
+
+            for query_name, call in make_calls(db, owner.id, task_id).items():
+                for _ in range(args.warmup):
+                    call()
+                cpu_start, wall_start = time.process_time(), time.perf_counter()
+                for _ in range(args.iterations):
+                    call()
+                cpu = (time.process_time() - cpu_start) / args.iterations * 1e6
+                wall = (time.perf_counter() - wall_start) / args.iterations * 1e6
+                # El proceso solo espera a Postgres: lo que no es CPU local es servidor + red
+                print(f"{query_name:<16}{name:<20}{cpu:>15.1f}{wall:>11.1f}{max(wall - cpu, 0):>17.1f}")
+
+            if not planning:
+                # Planning Time = parse/analisis + plan; con un plan generico preparado no se repite
+                statements = {
+                    "user_by_email": user_by_email.params(email=email),
+                    "task_by_id": task_by_id.params(task_id=task_id, owner_id=owner.id),
+                    "list (count)": count.params(owner_id=owner.id),
+                    "list (page)": page.params(owner_id=owner.id, skip=0, limit=10),
+                }
+                for query_name, statement in statements.items():
+                    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                    total = 0.0
+                    for _ in range(args.warmup):
+                        plan = db.execute(text(f"EXPLAIN (SUMMARY, FORMAT JSON) {sql}")).scalar()
+                        total += (json.loads(plan) if isinstance(plan, str) else plan)[0]["Planning Time"]
+                    planning[query_name] = total / max(args.warmup, 1) * 1000
+            db.rollback()
+        engine.dispose()
+        print()
+
+    print("Planning en Postgres por ejecución (lo que ahorra un plan preparado):")
+    for query_name, micros in planning.items():
+        print(f"  {query_name:<16}{micros:>8.1f} µs")
+
+
+# Se cargan en el lifespan o en el primer uso, nunca al importar la app
+LAZY_MODULES = ("psycopg", "passlib", "bcrypt", "jose", "opentelemetry")
+
+
+def _import_times(module: str) -> tuple[float, dict[str, float]]:
+    #Un interprete nuevo con -X importtime: (ms totales, ms propios por modulo)
+    import subprocess
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        sys.exit(result.returncode)
+
+    own: dict[str, float] = {}
+    total = 0.0
+    # "import time: self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        own[name.strip()] = int(self_us) / 1000
+        if name.strip() == module:
+            total = int(cumulative_us) / 1000
+    return total, own
+
+
+def bench_import(args: argparse.Namespace) -> None:
+    """Import time of the app (python -X importtime) against a budget: cold start of every worker."""
+    import statistics
+    from collections import defaultdict
+    from app.core.config import get_settings
+
+    # La primera corrida compila los .pyc y calienta el cache de disco
+    _import_times(args.module)
+    runs = [_import_times(args.module) for _ in range(args.runs)]
+    totals = [total for total, _ in runs]
+    median = statistics.median(totals)
+    # Corrida mediana para el desglose
+    _, own = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+    by_package: dict[str, float] = defaultdict(float)
+    for name, ms in own.items():
+        by_package[name.split(".")[0]] += ms
+    print(f"import {args.module}: mediana {median:.1f} ms (min {min(totals):.1f}, max {max(totals):.1f}, {args.runs} corridas)\n")
+    print("Paquetes más caros (tiempo propio de sus módulos):")
+    for package, ms in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {package:<28}{ms:>8.1f} ms")
+
+    failed = False
+    lazy = [name for name in LAZY_MODULES if not (name == "opentelemetry" and get_settings().TRACING_ENABLED)]
+    eager = sorted({name.split(".")[0] for name in own} & set(lazy))
+    if eager:
+        failed = True
+        print(f"\n❌ Se importan al cargar la app y deberían ser diferidos: {', '.join(eager)}")
+    if median > args.budget_ms:
+        failed = True
+        print(f"\n❌ {median:.1f} ms supera el presupuesto de {args.budget_ms:.0f} ms")
+    if failed:
+        sys.exit(1)
+    print(f"\n✅ Dentro del presupuesto de {args.budget_ms:.0f} ms")
+
+
+def _bcrypt_ms(rounds: int, samples: int) -> float:
+    #Mediana de ms por hash con ese costo
+    import statistics
+    import time
+    import bcrypt
+
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_bcrypt(args: argparse.Namespace) -> None:
+    """Pick the highest bcrypt cost whose hash fits the target latency and store it in .env."""
+    from pathlib import Path
+
+    # Nunca por debajo del minimo aunque la maquina sea lenta
+    chosen = args.min_rounds
+    print(f"Objetivo: {args.target_ms:.0f} ms por hash\n")
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        ms = _bcrypt_ms(rounds, args.samples)
+        fits = ms <= args.target_ms
+        print(f"{'✅' if fits else '❌'} rounds={rounds}: {ms:.1f} ms")
+        if not fits:
+            break
+        chosen = rounds
+
+    print(f"\nBCRYPT_ROUNDS={chosen}")
+    if args.dry_run:
+        return
+
+    env_file = Path(args.env_file)
+    lines = env_file.read_text(encoding="utf-8").splitlines() if env_file.exists() else []
+    lines = [line for line in lines if not line.startswith("BCRYPT_ROUNDS=")]
+    lines.append(f"BCRYPT_ROUNDS={chosen}")
+    env_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    print(f"✅ Guardado en {env_file}; los hashes existentes se actualizan en el próximo login")
+
+
+def _plan_node_types(plan: dict) -> list[str]:
+    #Tipos de nodo del plan (recursivo)
+    node_types = [plan["Node Type"]]
+    for child in plan.get("Plans", []):
+        node_types.extend(_plan_node_types(child))
+    return node_types
+
+
+def check_sort_plans(args: argparse.Namespace) -> None:
+    """Fail if any allowed list sort, with or without status filter, needs a Sort instead of an index scan."""
+    from sqlalchemy import select, text
+    from sqlalchemy.dialects import postgresql
+    from app.models.task import TaskStatus
+    from app.models.user import User
+    from app.schemas.task import TaskSort
+    from app.services.task_service import list_statements
+
+    failed = False
+    with SessionLocal() as db:
+        owner_id = args.owner_id or db.scalar(select(User.id).where(User.email == args.owner_email))
+        if owner_id is None:
+            print(f"❌ No existe el usuario {args.owner_email} (correr antes seed-plan-data)")
+            sys.exit(1)
+        for sort in TaskSort:
+            for has_status in (False, True):
+                _, page = list_statements(sort, has_status, None)
+                query = page.params(owner_id=owner_id, status_filter=TaskStatus.PENDING, skip=0, limit=10)
+                sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                # Planner con su configuracion normal: el plan que elige en produccion
+                plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+                db.rollback()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                node_types = _plan_node_types(plan[0]["Plan"])
+                label = f"sort={sort.value}{' status=pending' if has_status else ''}"
+                if {"Sort", "Incremental Sort"} & set(node_types):
+                    failed = True
+                    print(f"❌ {label}: {' -> '.join(node_types)}")
+                else:
+                    print(f"✅ {label}: {' -> '.join(node_types)}")
+
+    if failed:
+        sys.exit(1)
+
+
+def check_statement_timeout(args: argparse.Namespace) -> None:
+    """Fail if a later statement of a request does not get a smaller statement_timeout than an earlier one."""
+    import time
+    from sqlalchemy import text
+    from starlette.requests import Request
+    from app.core.config import get_settings
+    from app.db.session import get_db
+
+    settings = get_settings()
+    # Request sin ruta: deadline REQUEST_DEADLINE_SECONDS desde ahora
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "state": {"started_at": time.monotonic()}})
+    current = text("SELECT setting::int FROM pg_settings WHERE name = 'statement_timeout'")
+    sessions = get_db(request)
+    db = next(sessions)
+    try:
+        first = db.scalar(current)
+        time.sleep(args.pause)
+        second = db.scalar(current)
+    finally:
+        sessions.close()
+
+    # Cada statement recibe lo que queda, con hasta DB_STATEMENT_TIMEOUT_SLACK_MS de tolerancia
+    expected_drop = args.pause * 1000 - settings.DB_STATEMENT_TIMEOUT_SLACK_MS
+    print(f"1er statement: {first} ms, 2do tras {args.pause:.2f} s: {second} ms")
+    if first - second < expected_drop:
+        print(f"❌ El statement_timeout bajó {first - second} ms, se esperaban al menos {expected_drop:.0f}")
+        sys.exit(1)
+    print("✅ Cada statement corre con el tiempo restante de la request")
+
+
+# Usuarios sinteticos de seed-plan-data (dominio reservado, nunca es un usuario real)
+PLAN_USERS_DOMAIN = "plan.invalid"
+
+
+def seed_plan_data(args: argparse.Namespace) -> None:
+    """Load synthetic users and tasks with COPY, to check plans at production volumes."""
+    import random
+    import time
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import text
+    from app.core.security import get_password_hash
+
+    rng = random.Random(args.seed)
+    statuses = ("pending", "in_progress", "done")
+    tag_pool = ["backend", "frontend", "bug", "feature", "urgent", "infra", "docs"] + [f"sprint-{i}" for i in range(24)]
+    end = datetime.now(timezone.utc)
+    span = int(timedelta(days=730).total_seconds())
+
+    started = time.perf_counter()
+    with get_engine().begin() as conn:
+        if args.drop:
+            # ON DELETE CASCADE se lleva tareas, archivo, tombstones y rollups
+            conn.execute(text("DELETE FROM users WHERE email LIKE :pattern"), {"pattern": f"%@{PLAN_USERS_DOMAIN}"})
+        password = get_password_hash("PlanCheck123!")
+        cursor = conn.connection.driver_connection.cursor()
+
+        with cursor.copy("COPY users (email, hashed_password) FROM STDIN") as copy:
+            for i in range(args.users):
+                copy.write_row((f"plan-user-{i}@{PLAN_USERS_DOMAIN}", password))
+        owner_ids = [
+            row[0] for row in cursor.execute(
+                "SELECT id FROM users WHERE email LIKE %s ORDER BY id", (f"%@{PLAN_USERS_DOMAIN}",)
+            )
+        ]
+        # plan-user-0 (el primero) concentra hot_share de las tareas: el caso caro
+        hot_owner = owner_ids[0]
+
+        with cursor.copy(
+            "COPY tasks (owner_id, title, description, status, tags, created_at, updated_at) FROM STDIN"
+        ) as copy:
+            for n in range(args.tasks):
+                owner_id = hot_owner if rng.random() < args.hot_share else rng.choice(owner_ids)
+                created_at = end - timedelta(seconds=rng.randrange(span))
+                updated_at = created_at + timedelta(seconds=rng.randrange(int((end - created_at).total_seconds()) + 1))
+                copy.write_row((
+                    owner_id,
+                    f"Task {n}: {rng.choice(tag_pool)} follow-up",
+                    None if n % 3 else f"Synthetic task {n} for plan checks",
+                    statuses[rng.choices((0, 1, 2), weights=(60, 15, 25))[0]],
+                    rng.sample(tag_pool, rng.randint(0, 3)),
+                    created_at,
+                    updated_at
+                ))
+                if n and n % 500000 == 0:
+                    print(f"  {n} tareas...")
+        cursor.close()
+        # Estadisticas frescas: sin ellas el planner estima como si la tabla estuviera vacia
+        conn.execute(text("ANALYZE users"))
+        conn.execute(text("ANALYZE tasks"))
+
+    print(f"✅ {args.users} usuarios y {args.tasks} tareas en {time.perf_counter() - started:.1f}s "
+          f"(usuario pesado: plan-user-0@{PLAN_USERS_DOMAIN})")
+
+
+def _plan_problems(plan: dict, allow: set[str], seq_scan_rows: int) -> list[str]:
+    #Nodos que indican un plan degradado (recursivo)
+    problems = []
+    node_type = plan["Node Type"]
+    loops = plan.get("Actual Loops", 1)
+    if node_type == "Seq Scan" and "Seq Scan" not in allow:
+        # Una tabla chica se recorre mas barato sin indice: solo cuenta si lee muchas filas
+        rows = (plan.get("Actual Rows", 0) + plan.get("Rows Removed by Filter", 0)) * loops
+        if rows >= seq_scan_rows:
+            problems.append(f"Seq Scan on {plan.get('Relation Name')} ({rows} filas)")
+    if node_type in ("Sort", "Incremental Sort") and "Sort" not in allow:
+        problems.append(f"{node_type} ({', '.join(plan.get('Sort Key', []))})")
+    for child in plan.get("Plans", []):
+        problems.extend(_plan_problems(child, allow, seq_scan_rows))
+    return problems
+
+
+def check_plans(args: argparse.Namespace) -> None:
+    """
+    Run every task_service function and get_current_user against the seeded
+    data, EXPLAIN (ANALYZE, BUFFERS) each statement they emit and fail on
+    seq scans, explicit sorts or buffer growth over the saved baseline.
+    Everything runs in one transaction that is rolled back at the end.
+    """
+    from pathlib import Path
+    from sqlalchemy import event, select
+    from sqlalchemy.orm import Session
+    from app.core.security import get_current_user
+    from app.models.task import Task, TaskStatus
+    from app.models.user import User
+    from app.schemas.task import TagMatch, TaskCreate, TaskSort, TaskUpdate
+    from app.services import task_service
+    from app.core.config import get_settings
+    from app.services.archive_service import archive_batch
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists() and not args.update_baseline:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    elif not args.update_baseline:
+        print(f"⚠️  Sin baseline en {baseline_path}: solo se revisa la forma de los planes\n")
+
+    results: dict[str, dict] = {}
+    failed = False
+
+    with get_engine().connect() as conn:
+        outer = conn.begin()
+        # Los commit() de los servicios liberan un savepoint; el rollback final descarta todo
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        owner = db.scalar(select(User).where(User.email == args.owner_email))
+        if owner is None:
+            print(f"❌ No existe {args.owner_email}; ejecuta primero: python manage.py seed-plan-data")
+            sys.exit(1)
+        task_ids = db.scalars(
+            select(Task.id).where(Task.owner_id == owner.id).order_by(Task.id.desc()).limit(50)
+        ).all()
+        task_id = task_ids[0]
+
+        # (nombre, llamada, nodos permitidos)
+        scenarios = [
+            ("get_current_user", lambda: get_current_user(payload={"sub": owner.email}, db=db), set()),
+            ("get_task", lambda: task_service.get_task(db, owner.id, task_id), set()),
+            ("get_tasks_by_ids", lambda: task_service.get_tasks_by_ids(db, owner.id, task_ids), set()),
+            *[
+                (f"get_tasks sort={sort.value}", lambda sort=sort: task_service.get_tasks(db, owner.id, sort=sort), set())
+                for sort in TaskSort
+            ],
+            *[
+                (f"get_tasks status={item.value}", lambda item=item: task_service.get_tasks(db, owner.id, status_filter=item), set())
+                for item in TaskStatus
+            ],
+            # GIN no da orden: filtrar por tags siempre termina en un Sort (top-N)
+            *[
+                (f"get_tasks tags={match.value}", lambda match=match: task_service.get_tasks(
+                    db, owner.id, tags=["urgent", "bug"], tag_match=match
+                ), {"Sort"})
+                for match in TagMatch
+            ],
+            # El UNION ALL con el archivo se ordena despues de juntar ambas tablas
+            ("get_tasks include_archived", lambda: task_service.get_tasks(db, owner.id, include_archived=True), {"Sort"}),
+            ("create_task", lambda: task_service.create_task(db, owner.id, TaskCreate(title="plan check"), commit=False), set()),
+            ("update_task", lambda: task_service.update_task(
+                db, owner.id, task_id, TaskUpdate(status=TaskStatus.DONE), commit=False
+            ), set()),
+            ("claim_tasks", lambda: task_service.claim_tasks(db, owner.id, 10), set()),
+            ("delete_task", lambda: task_service.delete_task(db, owner.id, task_id, commit=False), set()),
+            # Todos los usuarios, por ix_tasks_done_updated_at_id (el commit solo libera el savepoint)
+            ("archive_batch", lambda: archive_batch(db, get_settings().ARCHIVE_AFTER_DAYS, 100), set()),
+        ]
+
+        for name, call, allow in scenarios:
+            plans = []
+
+            def explain(conn, cursor, statement, parameters, context, executemany):
+                # Antes del statement real y dentro de un savepoint: ANALYZE de un write no deja rastro
+                if not statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")):
+                    return
+                params = parameters[0] if executemany else parameters
+                cursor.execute("SAVEPOINT plan_check")
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, params)
+                plan = cursor.fetchone()[0]
+                cursor.execute("ROLLBACK TO SAVEPOINT plan_check")
+                plans.append(json.loads(plan) if isinstance(plan, str) else plan)
+
+            event.listen(conn, "before_cursor_execute", explain)
+            try:
+                call()
+            finally:
+                event.remove(conn, "before_cursor_execute", explain)
+
+            for index, plan in enumerate(plans):
+                key = f"{name} [{index}]"
+                root = plan[0]["Plan"]
+                buffers = root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+                problems = _plan_problems(root, allow, args.seq_scan_rows)
+                previous = baseline.get(key)
+                if previous and buffers > previous["buffers"] * (1 + args.buffer_tolerance) + 10:
+                    problems.append(f"buffers {previous['buffers']} -> {buffers}")
+                results[key] = {"buffers": buffers, "nodes": _plan_node_types(root)}
+
+                summary = f"{key}: {' -> '.join(results[key]['nodes'])} | {buffers} buffers, {plan[0]['Execution Time']:.2f} ms"
+                if problems:
+                    failed = True
+                    print(f"❌ {summary}\n     {'; '.join(problems)}")
+                else:
+                    print(f"✅ {summary}")
+
+        db.close()
+        outer.rollback()
+
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"\n✅ Baseline guardado en {baseline_path}")
+
+    if failed:
+        sys.exit(1)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Task Management API - comandos de mantenimiento")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    purge = subparsers.add_parser("purge-tombstones", help="Eliminar tombstones fuera de la retencion")
+    purge.set_defaults(func=purge_tombstones)
+
+    archive = subparsers.add_parser("archive-tasks", help="Mover tareas done antiguas a tasks_archive")
+    archive.add_argument("--days", type=int, default=None, help="Antigüedad mínima (default: ARCHIVE_AFTER_DAYS)")
+    archive.add_argument("--batch-size", type=int, default=None, help="Filas por lote (default: ARCHIVE_BATCH_SIZE)")
+    archive.add_argument("--sleep", type=float, default=0.0, help="Pausa en segundos entre lotes")
+    archive.add_argument("--max-batches", type=int, default=None, help="Máximo de lotes por ejecución")
+    archive.set_defaults(func=archive_tasks)
+
+    sort_plans = subparsers.add_parser("check-sort-plans", help="Verificar que cada sort permitido usa un índice")
+    sort_plans.add_argument("--owner-email", default=f"plan-user-0@{PLAN_USERS_DOMAIN}", help="Usuario de las queries (default: el usuario pesado de seed-plan-data)")
+    sort_plans.add_argument("--owner-id", type=int, default=None, help="Id de usuario (reemplaza a --owner-email)")
+    sort_plans.set_defaults(func=check_sort_plans)
+
+    timeouts = subparsers.add_parser("check-statement-timeout", help="Verificar que statement_timeout baja con cada statement de la request")
+    timeouts.add_argument("--pause", type=float, default=0.5, help="Segundos entre los dos statements (default: 0.5)")
+    timeouts.set_defaults(func=check_statement_timeout)
+
+    seed = subparsers.add_parser("seed-plan-data", help="Cargar usuarios y tareas sintéticas con COPY")
+    seed.add_argument("--tasks", type=int, default=2000000, help="Tareas a generar (default: 2000000)")
+    seed.add_argument("--users", type=int, default=1000, help="Usuarios a generar (default: 1000)")
+    seed.add_argument("--hot-share", type=float, default=0.1, help="Fracción de tareas del usuario pesado (default: 0.1)")
+    seed.add_argument("--seed", type=int, default=42, help="Semilla del generador (default: 42)")
+    seed.add_argument("--drop", action="store_true", help="Borrar antes los datos sintéticos existentes")
+    seed.set_defaults(func=seed_plan_data)
+
+    plans = subparsers.add_parser("check-plans", help="EXPLAIN ANALYZE de cada query de task_service y get_current_user")
+    plans.add_argument("--owner-email", default=f"plan-user-0@{PLAN_USERS_DOMAIN}", help="Usuario de las queries (default: el usuario pesado)")
+    plans.add_argument("--baseline", default="plan_baseline.json", help="Buffers de referencia (default: plan_baseline.json)")
+    plans.add_argument("--update-baseline", action="store_true", help="Guardar los buffers actuales como referencia")
+    plans.add_argument("--buffer-tolerance", type=float, default=0.5, help="Crecimiento de buffers tolerado (default: 0.5 = 50%%)")
+    plans.add_argument("--seq-scan-rows", type=int, default=1000, help="Filas desde las que un Seq Scan falla (default: 1000)")
+    plans.set_defaults(func=check_plans)
+
+    activity = subparsers.add_parser("backfill-activity", help="Recalcular el rollup de actividad diaria")
+    activity.set_defaults(func=backfill_activity)
+
+    bench = subparsers.add_parser("bench-compression", help="Medir CPU vs bytes ahorrados de gzip/brotli")
+    bench.add_argument("--items", type=int, default=100, help="Tareas en la página de ejemplo (default: 100)")
+    bench.add_argument("--rounds", type=int, default=200, help="Repeticiones por encoder (default: 200)")
+    bench.set_defaults(func=bench_compression)
+
+    bench_db = subparsers.add_parser("bench-queries", help="Medir el costo de las queries calientes (ORM vs cacheadas vs preparadas)")
+    bench_db.add_argument("--email", default=None, help="Usuario de las queries (default: INITIAL_USER_EMAIL)")
+    bench_db.add_argument("--iterations", type=int, default=2000, help="Llamadas medidas por query (default: 2000)")
+    bench_db.add_argument("--warmup", type=int, default=50, help="Llamadas de calentamiento (default: 50)")
+    bench_db.set_defaults(func=bench_queries)
+
+    bench_imp = subparsers.add_parser("bench-import", help="Medir el tiempo de import de la app contra un presupuesto")
+    bench_imp.add_argument("--module", default="app.main", help="Módulo a importar (default: app.main)")
+    bench_imp.add_argument("--runs", type=int, default=5, help="Corridas medidas, se reporta la mediana (default: 5)")
+    bench_imp.add_argument("--budget-ms", type=float, default=1500.0, help="Tiempo máximo de import (default: 1500)")
+    bench_imp.add_argument("--top", type=int, default=15, help="Paquetes a mostrar (default: 15)")
+    bench_imp.set_defaults(func=bench_import)
+
+    calibrate = subparsers.add_parser("calibrate-bcrypt", help="Elegir BCRYPT_ROUNDS para una latencia objetivo")
+    calibrate.add_argument("--target-ms", type=float, default=250.0, help="Latencia máxima por hash (default: 250)")
+    calibrate.add_argument("--min-rounds", type=int, default=10, help="Costo mínimo aceptado (default: 10)")
+    calibrate.add_argument("--max-rounds", type=int, default=16, help="Costo máximo a probar (default: 16)")
+    calibrate.add_argument("--samples", type=int, default=3, help="Mediciones por costo (default: 3)")
+    calibrate.add_argument("--env-file", default=".env", help="Archivo donde guardar BCRYPT_ROUNDS (default: .env)")
+    calibrate.add_argument("--dry-run", action="store_true", help="Solo mostrar el resultado")
+    calibrate.set_defaults(func=calibrate_bcrypt)
+
+    args = parser.parse_args(argv)
+    # Entorno limpio y SessionLocal con engine antes de cualquier comando (no abre conexiones)
+    get_engine()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Proceso interrumpido por el usuario")
+        sys.exit(1)